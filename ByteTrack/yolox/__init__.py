@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 # -*- coding:utf-8 -*-
 
-from .utils import configure_module
+from .env import configure_module
 
 configure_module()
 
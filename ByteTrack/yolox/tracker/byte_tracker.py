@@ -3,89 +3,65 @@ from collections import deque
 import os
 import os.path as osp
 import copy
-import torch
-import torch.nn.functional as F
 
 from .kalman_filter import KalmanFilter
 from yolox.tracker import matching
 from .basetrack import BaseTrack, TrackState
+from .track_store import TrackStore, tlbr_to_tlwh, tlwh_to_tlbr
 
-class STrack(BaseTrack):
-    shared_kalman = KalmanFilter()
-    def __init__(self, tlwh, score):
+class STrack(object):
+    """
+    View of one track in a TrackStore. Returned by BYTETracker.update and
+    valid until the next update, after which the slot may hold another track.
+    """
+    def __init__(self, store, slot):
+        self.store = store
+        self.slot = slot
 
-        # wait activate
-        self._tlwh = np.asarray(tlwh, dtype=np.float64)
-        self.kalman_filter = None
-        self.mean, self.covariance = None, None
-        self.is_activated = False
+    @property
+    def track_id(self):
+        return int(self.store.track_id[self.slot])
 
-        self.score = score
-        self.tracklet_len = 0
+    @property
+    def score(self):
+        return float(self.store.score[self.slot])
 
-    def predict(self):
-        mean_state = self.mean.copy()
-        if self.state != TrackState.Tracked:
-            mean_state[7] = 0
-        self.mean, self.covariance = self.kalman_filter.predict(mean_state, self.covariance)
+    @property
+    def state(self):
+        return int(self.store.state[self.slot])
 
-    @staticmethod
-    def multi_predict(stracks):
-        if len(stracks) > 0:
-            multi_mean = np.asarray([st.mean.copy() for st in stracks])
-            multi_covariance = np.asarray([st.covariance for st in stracks])
-            for i, st in enumerate(stracks):
-                if st.state != TrackState.Tracked:
-                    multi_mean[i][7] = 0
-            multi_mean, multi_covariance = STrack.shared_kalman.multi_predict(multi_mean, multi_covariance)
-            for i, (mean, cov) in enumerate(zip(multi_mean, multi_covariance)):
-                stracks[i].mean = mean
-                stracks[i].covariance = cov
-
-    def activate(self, kalman_filter, frame_id):
-        """Start a new tracklet"""
-        self.kalman_filter = kalman_filter
-        self.track_id = self.next_id()
-        self.mean, self.covariance = self.kalman_filter.initiate(self.tlwh_to_xyah(self._tlwh))
-
-        self.tracklet_len = 0
-        self.state = TrackState.Tracked
-        if frame_id == 1:
-            self.is_activated = True
-        # self.is_activated = True
-        self.frame_id = frame_id
-        self.start_frame = frame_id
-
-    def re_activate(self, new_track, frame_id, new_id=False):
-        self.mean, self.covariance = self.kalman_filter.update(
-            self.mean, self.covariance, self.tlwh_to_xyah(new_track.tlwh)
-        )
-        self.tracklet_len = 0
-        self.state = TrackState.Tracked
-        self.is_activated = True
-        self.frame_id = frame_id
-        if new_id:
-            self.track_id = self.next_id()
-        self.score = new_track.score
-
-    def update(self, new_track, frame_id):
-        """
-        Update a matched track
-        :type new_track: STrack
-        :type frame_id: int
-        :type update_feature: bool
-        :return:
-        """
-        self.frame_id = frame_id
-        self.tracklet_len += 1
+    @property
+    def is_activated(self):
+        return bool(self.store.is_activated[self.slot])
+
+    @property
+    def frame_id(self):
+        return int(self.store.frame_id[self.slot])
+
+    @property
+    def start_frame(self):
+        return int(self.store.start_frame[self.slot])
+
+    @property
+    def end_frame(self):
+        return self.frame_id
+
+    @property
+    def tracklet_len(self):
+        return int(self.store.tracklet_len[self.slot])
 
-        new_tlwh = new_track.tlwh
-        self.mean, self.covariance = self.kalman_filter.update(
-            self.mean, self.covariance, self.tlwh_to_xyah(new_tlwh))
-        self.state = TrackState.Tracked
-        self.is_activated = True
+    @property
+    def mean(self):
+        return self.store.mean[self.slot]
 
-        self.score = new_track.score
+    @property
+    def covariance(self):
+        return self.store.covariance[self.slot]
+
+    @property
+    def landmarks(self):
+        # 5-point face landmarks of the detection last associated with this track
+        return self.store.landmarks[self.slot]
 
     @property
     # @jit(nopython=True)
@@ -93,8 +69,6 @@ class STrack(BaseTrack):
         """Get current position in bounding box format `(top left x, top left y,
                 width, height)`.
         """
-        if self.mean is None:
-            return self._tlwh.copy()
         ret = self.mean[:4].copy()
         ret[2] *= ret[3]
         ret[:2] -= ret[2:] / 2
@@ -144,9 +118,10 @@ class STrack(BaseTrack):
 
 class BYTETracker(object):
     def __init__(self, args, frame_rate=30):
-        self.tracked_stracks = []  # type: list[STrack]
-        self.lost_stracks = []  # type: list[STrack]
-        self.removed_stracks = []  # type: list[STrack]
+        # Slots of self.store, kept in the order of the former STrack lists.
+        self.tracked_slots = np.empty(0, dtype=np.int64)
+        self.lost_slots = np.empty(0, dtype=np.int64)
+        self.store = TrackStore()
 
         self.frame_id = 0
         self.args = args
@@ -156,12 +131,22 @@ class BYTETracker(object):
         self.max_time_lost = self.buffer_size
         self.kalman_filter = KalmanFilter()
 
-    def update(self, output_results, img_info, img_size):
+    @property
+    def tracked_stracks(self):
+        return [STrack(self.store, slot) for slot in self.tracked_slots.tolist()]
+
+    @property
+    def lost_stracks(self):
+        return [STrack(self.store, slot) for slot in self.lost_slots.tolist()]
+
+    def active_track_ids(self):
+        """Ids of the tracked and lost tracks"""
+        slots = np.concatenate([self.tracked_slots, self.lost_slots])
+        return set(self.store.track_id[slots].tolist())
+
+    def update(self, output_results, img_info, img_size, landmarks=None):
         self.frame_id += 1
-        activated_starcks = []
-        refind_stracks = []
-        lost_stracks = []
-        removed_stracks = []
+        store = self.store
 
         if output_results.shape[1] == 5:
             scores = output_results[:, 4]
@@ -173,158 +158,128 @@ class BYTETracker(object):
         img_h, img_w = img_info[0], img_info[1]
         scale = min(img_size[0] / float(img_h), img_size[1] / float(img_w))
         bboxes /= scale
+        landmark_rows = np.empty(len(bboxes), dtype=object)
+        if landmarks is not None:
+            for i, lm in enumerate(np.asarray(landmarks) / scale):
+                landmark_rows[i] = lm
 
         remain_inds = scores > self.args.track_thresh
         inds_low = scores > 0.1
         inds_high = scores < self.args.track_thresh
 
         inds_second = np.logical_and(inds_low, inds_high)
-        dets_second = bboxes[inds_second]
-        dets = bboxes[remain_inds]
+        '''Detections, as tlwh rows'''
+        dets_second = tlbr_to_tlwh(bboxes[inds_second])
+        dets = tlbr_to_tlwh(bboxes[remain_inds])
         scores_keep = scores[remain_inds]
         scores_second = scores[inds_second]
-
-        if len(dets) > 0:
-            '''Detections'''
-            detections = [STrack(STrack.tlbr_to_tlwh(tlbr), s) for
-                          (tlbr, s) in zip(dets, scores_keep)]
-        else:
-            detections = []
+        landmarks_keep = landmark_rows[remain_inds]
+        landmarks_second = landmark_rows[inds_second]
 
         ''' Add newly detected tracklets to tracked_stracks'''
-        unconfirmed = []
-        tracked_stracks = []  # type: list[STrack]
-        for track in self.tracked_stracks:
-            if not track.is_activated:
-                unconfirmed.append(track)
-            else:
-                tracked_stracks.append(track)
+        confirmed = store.is_activated[self.tracked_slots]
+        unconfirmed = self.tracked_slots[~confirmed]
+        tracked_slots = self.tracked_slots[confirmed]
 
         ''' Step 2: First association, with high score detection boxes'''
-        strack_pool = joint_stracks(tracked_stracks, self.lost_stracks)
+        strack_pool = joint_slots(tracked_slots, self.lost_slots)
         # Predict the current location with KF
-        STrack.multi_predict(strack_pool)
-        dists = matching.iou_distance(strack_pool, detections)
+        store.predict(self.kalman_filter, strack_pool)
+        dists = matching.iou_distance(store.tlbr(strack_pool), tlwh_to_tlbr(dets))
         # if not self.args.mot20:
         #     dists = matching.fuse_score(dists, detections)
-        matches, u_track, u_detection = matching.linear_assignment(dists, thresh=self.args.match_thresh)
-
-        for itracked, idet in matches:
-            track = strack_pool[itracked]
-            det = detections[idet]
-            if track.state == TrackState.Tracked:
-                track.update(detections[idet], self.frame_id)
-                activated_starcks.append(track)
-            else:
-                track.re_activate(det, self.frame_id, new_id=False)
-                refind_stracks.append(track)
+        matches, u_track, u_detection = linear_assignment(dists, thresh=self.args.match_thresh)
+        activated_first, refind_first = self.update_matched(
+            strack_pool[matches[:, 0]], dets[matches[:, 1]],
+            scores_keep[matches[:, 1]], landmarks_keep[matches[:, 1]])
 
         ''' Step 3: Second association, with low score detection boxes'''
         # association the untrack to the low score detections
-        if len(dets_second) > 0:
-            '''Detections'''
-            detections_second = [STrack(STrack.tlbr_to_tlwh(tlbr), s) for
-                          (tlbr, s) in zip(dets_second, scores_second)]
-        else:
-            detections_second = []
-        r_tracked_stracks = [strack_pool[i] for i in u_track if strack_pool[i].state == TrackState.Tracked]
-        dists = matching.iou_distance(r_tracked_stracks, detections_second)
-        matches, u_track, u_detection_second = matching.linear_assignment(dists, thresh=0.5)
-        for itracked, idet in matches:
-            track = r_tracked_stracks[itracked]
-            det = detections_second[idet]
-            if track.state == TrackState.Tracked:
-                track.update(det, self.frame_id)
-                activated_starcks.append(track)
-            else:
-                track.re_activate(det, self.frame_id, new_id=False)
-                refind_stracks.append(track)
-
-        for it in u_track:
-            track = r_tracked_stracks[it]
-            if not track.state == TrackState.Lost:
-                track.mark_lost()
-                lost_stracks.append(track)
+        r_tracked_slots = strack_pool[u_track]
+        r_tracked_slots = r_tracked_slots[store.state[r_tracked_slots] == TrackState.Tracked]
+        dists = matching.iou_distance(store.tlbr(r_tracked_slots), tlwh_to_tlbr(dets_second))
+        matches, u_track, u_detection_second = linear_assignment(dists, thresh=0.5)
+        activated_second, refind_second = self.update_matched(
+            r_tracked_slots[matches[:, 0]], dets_second[matches[:, 1]],
+            scores_second[matches[:, 1]], landmarks_second[matches[:, 1]])
+
+        lost_slots = r_tracked_slots[u_track]
+        lost_slots = lost_slots[store.state[lost_slots] != TrackState.Lost]
+        store.state[lost_slots] = TrackState.Lost
 
         '''Deal with unconfirmed tracks, usually tracks with only one beginning frame'''
-        detections = [detections[i] for i in u_detection]
-        dists = matching.iou_distance(unconfirmed, detections)
+        dists = matching.iou_distance(store.tlbr(unconfirmed), tlwh_to_tlbr(dets[u_detection]))
         # if not self.args.mot20:
         #     dists = matching.fuse_score(dists, detections)
-        matches, u_unconfirmed, u_detection = matching.linear_assignment(dists, thresh=0.7)
-        for itracked, idet in matches:
-            unconfirmed[itracked].update(detections[idet], self.frame_id)
-            activated_starcks.append(unconfirmed[itracked])
-        for it in u_unconfirmed:
-            track = unconfirmed[it]
-            track.mark_removed()
-            removed_stracks.append(track)
+        matches, u_unconfirmed, u_new = linear_assignment(dists, thresh=0.7)
+        idets = u_detection[matches[:, 1]]
+        activated_unconfirmed, _ = self.update_matched(
+            unconfirmed[matches[:, 0]], dets[idets], scores_keep[idets], landmarks_keep[idets])
+        removed_slots = unconfirmed[u_unconfirmed]
+        store.state[removed_slots] = TrackState.Removed
 
         """ Step 4: Init new stracks"""
-        for inew in u_detection:
-            track = detections[inew]
-            if track.score < self.det_thresh:
-                continue
-            track.activate(self.kalman_filter, self.frame_id)
-            activated_starcks.append(track)
+        inew = u_detection[u_new]
+        inew = inew[scores_keep[inew] >= self.det_thresh]
+        new_slots = store.activate(
+            self.kalman_filter, dets[inew], scores_keep[inew], landmarks_keep[inew], self.frame_id)
         """ Step 5: Update state"""
-        for track in self.lost_stracks:
-            if self.frame_id - track.end_frame > self.max_time_lost:
-                track.mark_removed()
-                removed_stracks.append(track)
-
-        # print('Ramained match {} s'.format(t4-t3))
-
-        self.tracked_stracks = [t for t in self.tracked_stracks if t.state == TrackState.Tracked]
-        self.tracked_stracks = joint_stracks(self.tracked_stracks, activated_starcks)
-        self.tracked_stracks = joint_stracks(self.tracked_stracks, refind_stracks)
-        self.lost_stracks = sub_stracks(self.lost_stracks, self.tracked_stracks)
-        self.lost_stracks.extend(lost_stracks)
-        self.lost_stracks = sub_stracks(self.lost_stracks, self.removed_stracks)
-        self.removed_stracks.extend(removed_stracks)
-        self.tracked_stracks, self.lost_stracks = remove_duplicate_stracks(self.tracked_stracks, self.lost_stracks)
-        # get scores of lost tracks
-        output_stracks = [track for track in self.tracked_stracks if track.is_activated]
-
-        return output_stracks
-
-
-def joint_stracks(tlista, tlistb):
-    exists = {}
-    res = []
-    for t in tlista:
-        exists[t.track_id] = 1
-        res.append(t)
-    for t in tlistb:
-        tid = t.track_id
-        if not exists.get(tid, 0):
-            exists[tid] = 1
-            res.append(t)
-    return res
-
-
-def sub_stracks(tlista, tlistb):
-    stracks = {}
-    for t in tlista:
-        stracks[t.track_id] = t
-    for t in tlistb:
-        tid = t.track_id
-        if stracks.get(tid, 0):
-            del stracks[tid]
-    return list(stracks.values())
-
-
-def remove_duplicate_stracks(stracksa, stracksb):
-    pdist = matching.iou_distance(stracksa, stracksb)
-    pairs = np.where(pdist < 0.15)
-    dupa, dupb = list(), list()
-    for p, q in zip(*pairs):
-        timep = stracksa[p].frame_id - stracksa[p].start_frame
-        timeq = stracksb[q].frame_id - stracksb[q].start_frame
-        if timep > timeq:
-            dupb.append(q)
-        else:
-            dupa.append(p)
-    resa = [t for i, t in enumerate(stracksa) if not i in dupa]
-    resb = [t for i, t in enumerate(stracksb) if not i in dupb]
-    return resa, resb
+        expired = self.lost_slots[self.frame_id - store.frame_id[self.lost_slots] > self.max_time_lost]
+        store.state[expired] = TrackState.Removed
+        removed_slots = np.concatenate([removed_slots, expired])
+
+        activated_slots = np.concatenate([activated_first, activated_second, activated_unconfirmed, new_slots])
+        refind_slots = np.concatenate([refind_first, refind_second])
+        previous_slots = np.concatenate([self.tracked_slots, self.lost_slots, new_slots])
+
+        tracked_slots = self.tracked_slots[store.state[self.tracked_slots] == TrackState.Tracked]
+        tracked_slots = joint_slots(tracked_slots, activated_slots)
+        tracked_slots = joint_slots(tracked_slots, refind_slots)
+        lost = sub_slots(self.lost_slots, tracked_slots)
+        lost = np.concatenate([lost, lost_slots])
+        # Tracks removed in an earlier frame leave the lost list here; the
+        # ones removed in this frame stay in it until the next update.
+        lost = lost[~store.was_removed[lost]]
+        store.was_removed[removed_slots] = True
+        self.tracked_slots, self.lost_slots = remove_duplicate_slots(store, tracked_slots, lost)
+
+        # Slots of tracks that left both lists are reused by later tracks.
+        live = np.concatenate([self.tracked_slots, self.lost_slots])
+        store.release(np.unique(previous_slots[~np.isin(previous_slots, live)]))
+
+        output_slots = self.tracked_slots[store.is_activated[self.tracked_slots]]
+        return [STrack(store, slot) for slot in output_slots.tolist()]
+
+    def update_matched(self, slots, dets, scores, landmarks):
+        """Update matched tracks; returns the (activated, refound) slots"""
+        refind = self.store.state[slots] != TrackState.Tracked
+        self.store.update(self.kalman_filter, slots, dets, scores, landmarks, self.frame_id)
+        return slots[~refind], slots[refind]
+
+
+def linear_assignment(cost_matrix, thresh):
+    # matching.linear_assignment with int array outputs, so that empty
+    # results still index slot and detection arrays.
+    matches, u_a, u_b = matching.linear_assignment(cost_matrix, thresh=thresh)
+    return (np.asarray(matches, dtype=np.int64).reshape(-1, 2),
+            np.asarray(u_a, dtype=np.int64), np.asarray(u_b, dtype=np.int64))
+
+
+def joint_slots(slots_a, slots_b):
+    return np.concatenate([slots_a, slots_b[~np.isin(slots_b, slots_a)]])
+
+
+def sub_slots(slots_a, slots_b):
+    return slots_a[~np.isin(slots_a, slots_b)]
+
+
+def remove_duplicate_slots(store, slots_a, slots_b):
+    pdist = matching.iou_distance(store.tlbr(slots_a), store.tlbr(slots_b))
+    p, q = np.where(pdist < 0.15)
+    time_p = store.frame_id[slots_a[p]] - store.start_frame[slots_a[p]]
+    time_q = store.frame_id[slots_b[q]] - store.start_frame[slots_b[q]]
+    keep_a = np.ones(len(slots_a), dtype=bool)
+    keep_b = np.ones(len(slots_b), dtype=bool)
+    keep_a[p[time_p <= time_q]] = False
+    keep_b[q[time_p > time_q]] = False
+    return slots_a[keep_a], slots_b[keep_b]
@@ -180,17 +180,75 @@ class KalmanFilter(object):
             self._std_weight_velocity * mean[:, 3]]
         sqr = np.square(np.r_[std_pos, std_vel]).T
 
-        motion_cov = []
-        for i in range(len(mean)):
-            motion_cov.append(np.diag(sqr[i]))
-        motion_cov = np.asarray(motion_cov)
+        motion_cov = np.zeros((len(mean), 8, 8))
+        motion_cov[:, np.arange(8), np.arange(8)] = sqr
 
         mean = np.dot(mean, self._motion_mat.T)
-        left = np.dot(self._motion_mat, covariance).transpose((1, 0, 2))
-        covariance = np.dot(left, self._motion_mat.T) + motion_cov
+        covariance = np.matmul(np.matmul(self._motion_mat, covariance), self._motion_mat.T) + motion_cov
 
         return mean, covariance
 
+    def multi_initiate(self, measurement):
+        """Create tracks from unassociated measurements (Vectorized version).
+        Parameters
+        ----------
+        measurement : ndarray
+            The Nx4 dimensional bounding box coordinates (x, y, a, h).
+        Returns
+        -------
+        (ndarray, ndarray)
+            Returns the Nx8 mean matrix and Nx8x8 covariance matrices of the
+            new tracks. Unobserved velocities are initialized to 0 mean.
+        """
+        mean = np.c_[measurement, np.zeros_like(measurement)]
+
+        height = measurement[:, 3]
+        std = [
+            2 * self._std_weight_position * height,
+            2 * self._std_weight_position * height,
+            1e-2 * np.ones_like(height),
+            2 * self._std_weight_position * height,
+            10 * self._std_weight_velocity * height,
+            10 * self._std_weight_velocity * height,
+            1e-5 * np.ones_like(height),
+            10 * self._std_weight_velocity * height]
+        covariance = np.zeros((len(measurement), 8, 8))
+        covariance[:, np.arange(8), np.arange(8)] = np.square(std).T
+        return mean, covariance
+
+    def multi_update(self, mean, covariance, measurement):
+        """Run Kalman filter correction step (Vectorized version).
+        Parameters
+        ----------
+        mean : ndarray
+            The Nx8 dimensional predicted mean matrix.
+        covariance : ndarray
+            The Nx8x8 dimensional predicted covariance matrics.
+        measurement : ndarray
+            The Nx4 dimensional measurements (x, y, a, h).
+        Returns
+        -------
+        (ndarray, ndarray)
+            Returns the measurement-corrected state distributions.
+        """
+        std = [
+            self._std_weight_position * mean[:, 3],
+            self._std_weight_position * mean[:, 3],
+            1e-1 * np.ones_like(mean[:, 3]),
+            self._std_weight_position * mean[:, 3]]
+        projected_mean = np.dot(mean, self._update_mat.T)
+        projected_cov = np.matmul(np.matmul(self._update_mat, covariance), self._update_mat.T)
+        projected_cov[:, np.arange(4), np.arange(4)] += np.square(std).T
+
+        # K^T = S^-1 (P H^T)^T, solved for all tracks at once.
+        gain_t = np.linalg.solve(projected_cov, np.matmul(self._update_mat, covariance))
+        innovation = measurement - projected_mean
+
+        new_mean = mean + np.einsum('ni,nij->nj', innovation, gain_t)
+        new_covariance = covariance - np.matmul(
+            np.matmul(gain_t.transpose((0, 2, 1)), projected_cov), gain_t)
+        return new_mean, new_covariance
+
     def update(self, mean, covariance, measurement):
         """Run Kalman filter correction step.
 
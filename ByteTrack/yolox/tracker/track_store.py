@@ -0,0 +1,132 @@
+import numpy as np
+
+from .basetrack import BaseTrack, TrackState
+
+
+class TrackStore(object):
+    """
+    Struct-of-arrays state of the live tracks of one tracker.
+
+    Slot i holds one track: row i of the Nx8 `mean` and Nx8x8 `covariance`
+    plus its state, score and frame bookkeeping. Slots of dropped tracks go
+    back to a free list and are reused; the arrays double when it runs out.
+    Predict, update and box conversion take an int array of slots and run
+    on those rows at once.
+    """
+
+    def __init__(self, capacity=64):
+        self.capacity = 0
+        self.mean = np.zeros((0, 8))
+        self.covariance = np.zeros((0, 8, 8))
+        self.score = np.zeros(0)
+        self.track_id = np.zeros(0, dtype=np.int64)
+        self.state = np.zeros(0, dtype=np.int8)
+        self.is_activated = np.zeros(0, dtype=bool)
+        # Set once a track has been marked removed; BYTETracker keeps such a
+        # track out of the lost list from the next frame on.
+        self.was_removed = np.zeros(0, dtype=bool)
+        self.frame_id = np.zeros(0, dtype=np.int64)
+        self.start_frame = np.zeros(0, dtype=np.int64)
+        self.tracklet_len = np.zeros(0, dtype=np.int64)
+        self.landmarks = np.empty(0, dtype=object)
+        self.free_slots = []
+        self.grow(capacity)
+
+    def grow(self, capacity):
+        old_capacity = self.capacity
+        extra = capacity - old_capacity
+        self.mean = np.concatenate([self.mean, np.zeros((extra, 8))])
+        self.covariance = np.concatenate([self.covariance, np.zeros((extra, 8, 8))])
+        self.score = np.concatenate([self.score, np.zeros(extra)])
+        self.track_id = np.concatenate([self.track_id, np.zeros(extra, dtype=np.int64)])
+        self.state = np.concatenate([self.state, np.full(extra, TrackState.Removed, dtype=np.int8)])
+        self.is_activated = np.concatenate([self.is_activated, np.zeros(extra, dtype=bool)])
+        self.was_removed = np.concatenate([self.was_removed, np.zeros(extra, dtype=bool)])
+        self.frame_id = np.concatenate([self.frame_id, np.zeros(extra, dtype=np.int64)])
+        self.start_frame = np.concatenate([self.start_frame, np.zeros(extra, dtype=np.int64)])
+        self.tracklet_len = np.concatenate([self.tracklet_len, np.zeros(extra, dtype=np.int64)])
+        self.landmarks = np.concatenate([self.landmarks, np.empty(extra, dtype=object)])
+        # Lowest slots are handed out first.
+        self.free_slots.extend(range(capacity - 1, old_capacity - 1, -1))
+        self.capacity = capacity
+
+    def allocate(self, count):
+        while len(self.free_slots) < count:
+            self.grow(max(2 * self.capacity, 1))
+        slots = self.free_slots[len(self.free_slots) - count:][::-1]
+        del self.free_slots[len(self.free_slots) - count:]
+        return np.asarray(slots, dtype=np.int64)
+
+    def release(self, slots):
+        self.state[slots] = TrackState.Removed
+        self.landmarks[slots] = None
+        self.free_slots.extend(slots.tolist()[::-1])
+
+    def activate(self, kalman_filter, tlwh, score, landmarks, frame_id):
+        """Start new tracklets from Nx4 tlwh boxes and return their slots"""
+        slots = self.allocate(len(tlwh))
+        self.mean[slots], self.covariance[slots] = kalman_filter.multi_initiate(tlwh_to_xyah(tlwh))
+        self.track_id[slots] = np.arange(BaseTrack._count + 1, BaseTrack._count + 1 + len(slots))
+        BaseTrack._count += len(slots)
+        self.score[slots] = score
+        self.state[slots] = TrackState.Tracked
+        self.is_activated[slots] = frame_id == 1
+        self.was_removed[slots] = False
+        self.frame_id[slots] = frame_id
+        self.start_frame[slots] = frame_id
+        self.tracklet_len[slots] = 0
+        self.landmarks[slots] = landmarks
+        return slots
+
+    def predict(self, kalman_filter, slots):
+        if len(slots) == 0:
+            return
+        mean = self.mean[slots]
+        mean[self.state[slots] != TrackState.Tracked, 7] = 0
+        self.mean[slots], self.covariance[slots] = kalman_filter.multi_predict(mean, self.covariance[slots])
+
+    def update(self, kalman_filter, slots, tlwh, score, landmarks, frame_id):
+        """
+        Update matched tracks with their Nx4 tlwh detections. Tracks that were
+        not in the Tracked state are re-activated, which restarts their
+        tracklet length.
+        """
+        if len(slots) == 0:
+            return
+        self.mean[slots], self.covariance[slots] = kalman_filter.multi_update(
+            self.mean[slots], self.covariance[slots], tlwh_to_xyah(tlwh))
+        tracked = self.state[slots] == TrackState.Tracked
+        self.tracklet_len[slots] = np.where(tracked, self.tracklet_len[slots] + 1, 0)
+        self.state[slots] = TrackState.Tracked
+        self.is_activated[slots] = True
+        self.frame_id[slots] = frame_id
+        self.score[slots] = score
+        self.landmarks[slots] = landmarks
+
+    def tlwh(self, slots):
+        ret = self.mean[slots, :4]
+        ret[:, 2] *= ret[:, 3]
+        ret[:, :2] -= ret[:, 2:] / 2
+        return ret
+
+    def tlbr(self, slots):
+        return tlwh_to_tlbr(self.tlwh(slots))
+
+
+def tlwh_to_xyah(tlwh):
+    ret = np.array(tlwh, dtype=np.float64)
+    ret[:, :2] += ret[:, 2:] / 2
+    ret[:, 2] /= ret[:, 3]
+    return ret
+
+
+def tlbr_to_tlwh(tlbr):
+    ret = np.array(tlbr, dtype=np.float64)
+    ret[:, 2:] -= ret[:, :2]
+    return ret
+
+
+def tlwh_to_tlbr(tlwh):
+    ret = np.array(tlwh, dtype=np.float64)
+    ret[:, 2:] += ret[:, :2]
+    return ret
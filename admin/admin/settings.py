@@ -131,4 +131,7 @@ STATICFILES_DIRS = [
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-AUTH_USER_MODEL = 'admin_system.User'
\ No newline at end of file
+AUTH_USER_MODEL = 'admin_system.User'
+
+# Control API of recognition_service.py, which keeps the face models loaded.
+RECOGNITION_SERVICE_URL = 'http://127.0.0.1:8765'
@@ -5,7 +5,8 @@ from django.contrib import messages
 from django.http import HttpResponseForbidden
 from django.utils.timezone import now
 from .models import Attendance, Student, Subject, Enrollment
-import subprocess
+from .recognition_client import RecognitionClient
+from urllib.error import URLError
 
 
 @login_required
@@ -40,11 +41,13 @@ def attendance_subject(request, subject_id):
                 student_id = int(student_id)
 
                 if is_checked and student_id not in attended_students:
-                    Attendance.objects.create(
+                    # The recognition service may have logged the student since
+                    # the page was loaded; the day's row is unique, so reuse it.
+                    Attendance.objects.get_or_create(
                         student_id=student_id,
                         subject_id=subject_id,
-                        status='Present',
-                        created_at=now(),
+                        created_at=today,
+                        defaults={'status': 'Present'},
                     )
                     messages.success(request, "Attendance marked for the student.")
                 elif not is_checked and student_id in attended_students:
@@ -79,18 +82,33 @@ def attendance_subject(request, subject_id):
 
 @login_required
 def face_recognition(request, subject_id):
+    # The recognition service runs the session in the background, so the
+    # request returns as soon as the camera window opens.
     try:
-        script_path = r"D:\Git Project\Face-Recognition\webmain.py"
-        result = subprocess.run(
-            ["python", script_path, str(subject_id)],
-            capture_output=True, text=True
-        )
-
-        if result.returncode == 0:
-            messages.success(request, "Face recognition completed successfully!")
+        result = RecognitionClient().start_session(subject_id)
+        if result.get("accepted"):
+            messages.success(request, "Face recognition session started.")
+        elif "job" in result:
+            messages.error(request, f"The camera is busy with a running {result['job']['kind']}.")
         else:
-            messages.error(request, f"Error during face recognition: {result.stderr}")
+            messages.error(request, f"Error during face recognition: {result.get('error')}")
+    except URLError:
+        messages.error(request, "The recognition service is not running. Start it with: python recognition_service.py")
+    except Exception as e:
+        messages.error(request, f"An error occurred: {str(e)}")
+
+    return redirect('attendance_subject', subject_id=subject_id)
+
 
+@login_required
+def stop_face_recognition(request, subject_id):
+    try:
+        if RecognitionClient().stop_session().get("stopped"):
+            messages.success(request, "Face recognition session stopped.")
+        else:
+            messages.error(request, "No face recognition session is running.")
+    except URLError:
+        messages.error(request, "The recognition service is not running.")
     except Exception as e:
         messages.error(request, f"An error occurred: {str(e)}")
 
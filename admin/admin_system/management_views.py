@@ -4,7 +4,8 @@ from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
 from django.http import HttpResponseForbidden
 from .models import Attendance, Student, Faculty, Enrollment, Subject, User
-import subprocess
+from .recognition_client import RecognitionClient
+from urllib.error import URLError
 import os
 from django.conf import settings
 import shutil
@@ -140,17 +141,18 @@ def add_faces(request, student_id):
     student = get_object_or_404(Student, id=student_id)
 
     try:
-        script_path = r"D:\Git Project\Face-Recognition\webfacesaver.py"
-        result = subprocess.run(
-            ["python", script_path, str(student.name), str(student.enrollment_number), str(student.faculty)],
-            capture_output=True, text=True
+        result = RecognitionClient().enroll(
+            str(student.name), str(student.enrollment_number), str(student.faculty)
         )
-
-        if result.returncode == 0:
-            alert_message = "Face recognition completed successfully!"
+        if result.get("accepted"):
+            alert_message = "Face capture started. The faces are saved automatically once the student is in front of the camera."
+        elif "job" in result:
+            alert_message = f"The camera is busy with a running {result['job']['kind']}."
         else:
-            alert_message = f"Error during face recognition: {result.stderr}"
+            alert_message = f"Error during face capture: {result.get('error')}"
 
+    except URLError:
+        alert_message = "The recognition service is not running. Start it with: python recognition_service.py"
     except Exception as e:
         alert_message = f"An error occurred: {str(e)}"
 
@@ -0,0 +1,69 @@
+import copy
+
+from django.db import migrations, models
+
+
+def rename_date_column(apps, schema_editor):
+    # Migration 0002 created the column as "date", but the deployed table and
+    # every query already use "created_at". Only databases built from the
+    # migrations still need the rename.
+    Attendance = apps.get_model('admin_system', 'Attendance')
+    table = Attendance._meta.db_table
+    with schema_editor.connection.cursor() as cursor:
+        columns = [
+            column.name
+            for column in schema_editor.connection.introspection.get_table_description(cursor, table)
+        ]
+    if 'date' in columns:
+        old_field = Attendance._meta.get_field('date')
+        new_field = copy.copy(old_field)
+        new_field.set_attributes_from_name('created_at')
+        schema_editor.alter_field(Attendance, old_field, new_field)
+
+
+def remove_duplicate_attendance(apps, schema_editor):
+    # Rows left by the old check-then-insert path; the earliest one is kept.
+    Attendance = apps.get_model('admin_system', 'Attendance')
+    seen = set()
+    duplicates = []
+    records = Attendance.objects.order_by('id').values_list('id', 'student_id', 'subject_id', 'created_at')
+    for record_id, student_id, subject_id, created_at in records.iterator():
+        key = (student_id, subject_id, created_at)
+        if key in seen:
+            duplicates.append(record_id)
+        else:
+            seen.add(key)
+    for start in range(0, len(duplicates), 500):
+        Attendance.objects.filter(id__in=duplicates[start:start + 500]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_system', '0002_faculty_subject_alter_user_role_student_enrollment_and_more'),
+    ]
+
+    # The attendance writer relies on INSERT ... ON DUPLICATE KEY, so one row
+    # per student, subject and day is enforced by the database.
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(rename_date_column, migrations.RunPython.noop),
+            ],
+            state_operations=[
+                migrations.RenameField(
+                    model_name='attendance',
+                    old_name='date',
+                    new_name='created_at',
+                ),
+            ],
+        ),
+        migrations.RunPython(remove_duplicate_attendance, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='attendance',
+            constraint=models.UniqueConstraint(
+                fields=['student', 'subject', 'created_at'],
+                name='unique_daily_attendance',
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_system', '0003_attendance_unique_daily_record'),
+    ]
+
+    # The attendance writer stores a check-out by updating the day's row to
+    # "Check-Out"; the value already fits the column, only the choices change.
+    operations = [
+        migrations.AlterField(
+            model_name='attendance',
+            name='status',
+            field=models.CharField(choices=[('Present', 'Present'), ('Absent', 'Absent'), ('Check-Out', 'Check-Out')], max_length=10),
+        ),
+    ]
@@ -46,8 +46,13 @@ class Enrollment(models.Model):
 class Attendance(models.Model):
     student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='attendance_records')
     subject = models.ForeignKey(Subject, on_delete=models.CASCADE, related_name='attendance_records')
-    status = models.CharField(max_length=10, choices=[('Present', 'Present'), ('Absent', 'Absent')])
+    status = models.CharField(max_length=10, choices=[('Present', 'Present'), ('Absent', 'Absent'), ('Check-Out', 'Check-Out')])
     created_at = models.DateField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'subject', 'created_at'], name='unique_daily_attendance'),
+        ]
+
     def __str__(self):
         return f"{self.student.name} - {self.subject.name} - {self.created_at} - {self.status}"
\ No newline at end of file
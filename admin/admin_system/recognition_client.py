@@ -0,0 +1,39 @@
+import json
+import urllib.error
+import urllib.request
+from django.conf import settings
+
+
+class RecognitionClient:
+    # Client for the control API of recognition_service.py, which keeps the
+    # models loaded; views return as soon as the service accepts a job.
+    def __init__(self, url=None, timeout=2.0):
+        url = url or getattr(settings, "RECOGNITION_SERVICE_URL", "http://127.0.0.1:8765")
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def request(self, method, path, payload=None):
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        request = urllib.request.Request(
+            self.url + path, data=data, method=method, headers={"Content-Type": "application/json"}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            # 409 and 400 still carry a JSON body describing the job or error.
+            return json.loads(e.read())
+
+    def status(self):
+        return self.request("GET", "/status")
+
+    def start_session(self, subject_id):
+        return self.request("POST", "/sessions", {"subject_id": subject_id})
+
+    def stop_session(self):
+        return self.request("POST", "/sessions/stop", {})
+
+    def enroll(self, name, enrollment_number, faculty):
+        return self.request("POST", "/enrollments", {
+            "name": name, "enrollment_number": enrollment_number, "faculty": faculty,
+        })
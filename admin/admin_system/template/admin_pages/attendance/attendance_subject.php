@@ -157,6 +157,7 @@
                     <div class="d-flex justify-content-between align-items-center">
                       <h4>Student List</h4>
                       <a class="nav-link btn btn-success create-new-button col-2" href="{% url 'face_recognition' subject.id %}">Face Recognition</a>
+                      <a class="nav-link btn btn-danger create-new-button col-2" href="{% url 'stop_face_recognition' subject.id %}">Stop Recognition</a>
                     </div>
                     {% if output %}
                     <h3>Script Output:</h3>
@@ -13,6 +13,7 @@ urlpatterns = [
     path('attendance/', attendance_views.attendance, name='attendance'),
     path('attendance_subject/<int:subject_id>/', attendance_views.attendance_subject, name='attendance_subject'),
     path('face_recognition/<int:subject_id>/', attendance_views.face_recognition, name='face_recognition'),
+    path('stop_face_recognition/<int:subject_id>/', attendance_views.stop_face_recognition, name='stop_face_recognition'),
     
     # Management URLs
     path('management/', management_views.user_management, name='management'),
@@ -0,0 +1,117 @@
+import time
+import queue
+import logging
+import threading
+from mysql.connector import errors
+
+# Failures caused by the rows themselves (e.g. a deleted student or subject).
+# Only these drop records; anything else, such as the server being down or
+# the pool being exhausted, keeps them for the next attempt.
+DATA_ERRORS = (errors.IntegrityError, errors.DataError, errors.ProgrammingError)
+FOREIGN_KEY_ERRNOS = (1451, 1452)
+
+
+def is_data_error(e):
+    return isinstance(e, DATA_ERRORS) or getattr(e, "errno", None) in FOREIGN_KEY_ERRNOS
+
+
+class AttendanceWriter:
+    # Background attendance sink. The video path only calls submit(), which
+    # never touches the database; a worker thread batches the rows into
+    # DatabaseUtils.log_attendance_batch.
+    def __init__(self, db_utils, flush_interval=1.0, batch_size=64, max_queue=1000, retry_interval=5.0):
+        self.db_utils = db_utils
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.retry_interval = retry_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        # (student_id, subject_id, date, status) already accepted today: one
+        # check-in and one check-out per student, subject and day.
+        self.logged = set()
+        self.lock = threading.Lock()
+        self.pending = []
+        self.written = 0
+        self.dropped = 0
+        self.running = False
+        self.thread = threading.Thread(target=self.run, name="attendance-writer", daemon=True)
+
+    def start(self):
+        self.running = True
+        self.thread.start()
+        return self
+
+    def submit(self, created_at, status, student_id, subject_id):
+        # Returns True when the row was queued, False if it is a repeat.
+        key = (student_id, subject_id, created_at, status)
+        with self.lock:
+            if key in self.logged:
+                return False
+            self.logged.add(key)
+        try:
+            self.queue.put_nowait((created_at, status, student_id, subject_id))
+            return True
+        except queue.Full:
+            with self.lock:
+                self.logged.discard(key)
+            logging.warning(f"Attendance queue full; dropping record for student {student_id}.")
+            return False
+
+    def drain(self, timeout):
+        deadline = time.monotonic() + timeout
+        while len(self.pending) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                self.pending.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+    def flush(self):
+        if not self.pending:
+            return True
+        try:
+            self.db_utils.log_attendance_batch(self.pending)
+        except Exception as e:
+            if not is_data_error(e):
+                # Keep the rows and try again later; the unique key makes retries safe.
+                logging.error(f"Error writing {len(self.pending)} attendance records: {e}")
+                return False
+            # One bad row fails the whole batch, so it is written row by row
+            # and only the bad rows are dropped.
+            logging.warning(f"Attendance batch rejected, writing its records one by one: {e}")
+            return self.flush_rows()
+        self.written += len(self.pending)
+        self.pending = []
+        return True
+
+    def flush_rows(self):
+        while self.pending:
+            record = self.pending[0]
+            try:
+                self.db_utils.log_attendance_batch([record])
+                self.written += 1
+            except Exception as e:
+                if not is_data_error(e):
+                    logging.error(f"Error writing {len(self.pending)} attendance records: {e}")
+                    return False
+                logging.error(f"Dropping attendance record {record}: {e}")
+                self.dropped += 1
+            self.pending.pop(0)
+        return True
+
+    def run(self):
+        while self.running or not self.queue.empty():
+            self.drain(self.flush_interval)
+            if not self.flush():
+                if not self.running:
+                    break
+                time.sleep(self.retry_interval)
+        self.flush()
+
+    def close(self, timeout=5.0):
+        self.running = False
+        if self.thread.is_alive():
+            self.thread.join(timeout=timeout)
+        if self.pending or not self.queue.empty():
+            logging.warning(f"{len(self.pending) + self.queue.qsize()} attendance records were not written.")
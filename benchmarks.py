@@ -0,0 +1,428 @@
+import os
+import time
+import argparse
+import numpy as np
+from face_gallery import FaceGallery
+from face_index import BruteForceIndex, IVFPQIndex
+
+
+def time_call(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def random_embeddings(count, dim=512, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal((count, dim)).astype(np.float32)
+
+
+def bench_gallery(args):
+    print(f"mode={args.mode} templates/identity={args.templates}")
+    print(f"{'gallery':>8} {'loop ms':>10} {'single ms':>10} {'batch ms/face':>14}")
+    for size in args.sizes:
+        embeddings = random_embeddings(size * args.templates).reshape(size, args.templates, -1)
+        face_db = {(i, f"student_{i}"): list(embeddings[i]) for i in range(size)}
+        gallery = FaceGallery.from_face_db(face_db, mode=args.mode)
+        queries = random_embeddings(args.faces, seed=1)
+
+        def per_identity_loop():
+            query = queries[0] / np.linalg.norm(queries[0])
+            best = 0.0
+            for templates in face_db.values():
+                for db_embedding in templates:
+                    similarity = np.dot(db_embedding, query) / np.linalg.norm(db_embedding)
+                    best = max(best, similarity)
+            return best
+
+        repeat = max(1, args.repeat // max(1, size // 1000))
+        loop_time = time_call(per_identity_loop, max(1, repeat // 10)) if size * args.templates <= 10000 else float("nan")
+        single_time = time_call(lambda: gallery.search(queries[0]), repeat)
+        batch_time = time_call(lambda: gallery.search_batch(queries), repeat) / len(queries)
+        print(f"{size:>8} {loop_time * 1e3:>10.3f} {single_time * 1e3:>10.3f} {batch_time * 1e3:>14.3f}")
+
+
+def bench_ann(args):
+    rng = np.random.default_rng(0)
+    # Clustered synthetic embeddings; queries are noisy copies of stored rows.
+    centers = random_embeddings(max(1, args.size // 50), seed=2)
+    vectors = centers[rng.integers(0, len(centers), args.size)] + 0.8 * random_embeddings(args.size, seed=3)
+    targets = rng.integers(0, args.size, args.queries)
+    queries = vectors[targets] + args.noise * random_embeddings(args.queries, seed=4)
+
+    brute = BruteForceIndex().add(vectors)
+    start = time.perf_counter()
+    ivfpq = IVFPQIndex(nlist=args.nlist, m=args.m, nprobe=args.nprobe).train(vectors).add(vectors)
+    print(f"size={args.size} nlist={args.nlist} m={args.m} nprobe={args.nprobe} "
+          f"train+add {time.perf_counter() - start:.1f}s")
+
+    exact, _ = brute.search(queries, k=1)
+    print(f"{'backend':>8} {'recall@1':>9} {'ms/query':>9}")
+    for name, index in (("brute", brute), ("ivfpq", ivfpq)):
+        found, _ = index.search(queries, k=1)
+        recall = np.mean(found[:, 0] == exact[:, 0])
+        latency = time_call(lambda: index.search(queries[:1], k=1), args.repeat)
+        print(f"{name:>8} {recall:>9.3f} {latency * 1e3:>9.3f}")
+
+
+def bench_liveness(args):
+    from concurrent.futures import ThreadPoolExecutor
+    from silentFaceSpoofing import SilentFaceAntiSpoofing
+    from motion_clarity_utils import MotionClarityUtils
+    from liveness_pool import ProcessLivenessPool
+
+    rng = np.random.default_rng(0)
+    crops = [rng.integers(0, 255, (args.crop_size, args.crop_size, 3), dtype=np.uint8) for _ in range(max(args.faces))]
+    executor = ThreadPoolExecutor(max_workers=args.workers)
+    thread_model = SilentFaceAntiSpoofing(args.model)
+    thread_checks = MotionClarityUtils()
+    pool = ProcessLivenessPool(args.model, max_workers=args.workers)
+
+    def liveness(model, checks, crop):
+        checks.analyze_texture(crop)
+        checks.analyze_frequency(crop)
+        return model.predict(crop)
+
+    print(f"workers={args.workers} crop={args.crop_size}px")
+    print(f"{'faces':>6} {'thread ms':>10} {'process ms':>11}")
+    try:
+        for faces in args.faces:
+            def run(model, checks):
+                futures = [executor.submit(liveness, model, checks, crop) for crop in crops[:faces]]
+                return [future.result() for future in futures]
+            thread_time = time_call(lambda: run(thread_model, thread_checks), args.repeat)
+            process_time = time_call(lambda: run(pool, pool), args.repeat)
+            print(f"{faces:>6} {thread_time * 1e3:>10.2f} {process_time * 1e3:>11.2f}")
+    finally:
+        pool.close()
+        executor.shutdown()
+
+
+def profile_anti_spoofing(backend, model_path, batch_sizes, repeat):
+    # Runs in a fresh process so import time and resident memory are per backend.
+    import resource
+    from export_anti_spoofing import parity_crops
+
+    start = time.perf_counter()
+    from silentFaceSpoofing import load_anti_spoofing_model
+    import_time = time.perf_counter() - start
+    start = time.perf_counter()
+    model = load_anti_spoofing_model(backend, model_path)
+    load_time = time.perf_counter() - start
+
+    crops = parity_crops(max(batch_sizes))
+    latencies = {size: time_call(lambda: model.predict_scores(crops[:size]), repeat) for size in batch_sizes}
+    return {
+        "import": import_time,
+        "load": load_time,
+        "latencies": latencies,
+        # ru_maxrss is reported in KiB on Linux.
+        "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "scores": model.predict_scores(crops),
+    }
+
+
+def bench_spoofing(args):
+    import multiprocessing
+
+    from silentFaceSpoofing import MODEL_FILES
+
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for backend in args.backends:
+        with context.Pool(1) as pool:
+            results[backend] = pool.apply(
+                profile_anti_spoofing, (backend, MODEL_FILES[backend], args.batch_sizes, args.repeat)
+            )
+
+    header = " ".join(f"{f'b={size} ms':>10}" for size in args.batch_sizes)
+    print(f"{'backend':>8} {'import s':>9} {'load s':>7} {'rss MB':>7} {header}")
+    for backend, result in results.items():
+        latencies = " ".join(f"{result['latencies'][size] * 1e3:>10.2f}" for size in args.batch_sizes)
+        print(f"{backend:>8} {result['import']:>9.2f} {result['load']:>7.2f} {result['rss_mb']:>7.0f} {latencies}")
+
+    reference = args.backends[0]
+    expected = results[reference]["scores"]
+    for backend in args.backends[1:]:
+        actual = results[backend]["scores"]
+        print(f"{backend} vs {reference}: max score diff {np.abs(expected - actual).max():.2e}, "
+              f"decision agreement {np.mean((expected > 0.5) == (actual > 0.5)):.1%}")
+
+
+def bench_frequency(args):
+    from motion_clarity_utils import FREQUENCY_MODES, MotionClarityUtils
+
+    rng = np.random.default_rng(0)
+    checks = {mode: MotionClarityUtils(frequency_mode=mode) for mode in FREQUENCY_MODES}
+    print(f"{'crop px':>8} " + " ".join(f"{mode + ' ms':>9}" for mode in FREQUENCY_MODES))
+    for size in args.crop_sizes:
+        crop = rng.integers(0, 255, (size, size, 3), dtype=np.uint8)
+        times = [time_call(lambda: checks[mode].analyze_frequency(crop), args.repeat) for mode in FREQUENCY_MODES]
+        print(f"{size:>8} " + " ".join(f"{t * 1e3:>9.3f}" for t in times))
+
+
+def calibrate_frequency(args):
+    import cv2
+    from glob import glob
+    from motion_clarity_utils import MotionClarityUtils
+
+    checks = MotionClarityUtils(frequency_mode="rfft")
+    statistics = [
+        ("full mean", checks.mean_frequency, checks.frequency_threshold),
+        ("rfft ratio", checks.frequency_ratio, checks.frequency_ratio_threshold),
+    ]
+    sets = [("real", args.real)] + ([("spoof", args.spoof)] if args.spoof else [])
+    print(f"{'crops':>6} {'statistic':>10} {'n':>5} {'p5':>9} {'p25':>9} {'p50':>9} "
+          f"{'p75':>9} {'p95':>9} {'threshold':>10} {'passed':>7}")
+    for label, pattern in sets:
+        crops = [crop for crop in (cv2.imread(path) for path in sorted(glob(pattern))) if crop is not None]
+        if not crops:
+            print(f"{label:>6} no images match {pattern}")
+            continue
+        for name, statistic, threshold in statistics:
+            values = np.array([statistic(crop) for crop in crops])
+            percentiles = np.percentile(values, [5, 25, 50, 75, 95])
+            print(f"{label:>6} {name:>10} {len(values):>5} " + " ".join(f"{p:>9.4f}" for p in percentiles)
+                  + f" {threshold:>10.4f} {np.mean(values >= threshold):>7.1%}")
+    if not args.spoof:
+        print("Pass --spoof with crops of printed or replayed faces to compare the distributions.")
+
+
+def bench_features(args):
+    import cv2
+    from motion_clarity_utils import CropFeatures
+
+    rng = np.random.default_rng(0)
+    size = (300, 300)
+
+    def per_check(crop):
+        # What clarity, texture, motion and frequency each used to compute.
+        cv2.Laplacian(cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY), cv2.CV_64F).var()
+        cv2.Laplacian(cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY), cv2.CV_64F).var()
+        cv2.GaussianBlur(cv2.cvtColor(cv2.resize(crop, size), cv2.COLOR_BGR2GRAY), (5, 5), 0)
+        cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+
+    def shared(crop):
+        features = CropFeatures(crop)
+        features.laplacian_var
+        features.laplacian_var
+        features.blurred(size)
+        features.gray
+
+    print(f"{'crop px':>8} {'per-check ms':>13} {'shared ms':>10}")
+    for crop_size in args.crop_sizes:
+        crop = rng.integers(0, 255, (crop_size, crop_size, 3), dtype=np.uint8)
+        before = time_call(lambda: per_check(crop), args.repeat)
+        after = time_call(lambda: shared(crop), args.repeat)
+        print(f"{crop_size:>8} {before * 1e3:>13.3f} {after * 1e3:>10.3f}")
+
+
+def bench_db(args):
+    # Connect-per-call (the old DatabaseUtils pattern) against one pooled
+    # connection with a prepared statement, for the same point query.
+    if args.backend == "sqlite":
+        import sqlite3
+        import tempfile
+
+        path = os.path.join(tempfile.mkdtemp(), "attendance.sqlite3")
+        with sqlite3.connect(path) as conn:
+            conn.execute("CREATE TABLE admin_system_attendance (id INTEGER PRIMARY KEY, student_id INT)")
+            conn.executemany("INSERT INTO admin_system_attendance (student_id) VALUES (?)",
+                             [(i,) for i in range(1000)])
+        query = "SELECT id FROM admin_system_attendance WHERE student_id = ?"
+
+        def per_call():
+            conn = sqlite3.connect(path)
+            conn.execute(query, (7,)).fetchone()
+            conn.close()
+
+        pooled_conn = sqlite3.connect(path, check_same_thread=False)
+
+        def pooled():
+            pooled_conn.execute(query, (7,)).fetchone()
+    else:
+        import mysql.connector
+        from database_utils import DatabaseUtils, db_config
+
+        query = "SELECT id FROM admin_system_attendance WHERE student_id = %s"
+
+        def per_call():
+            conn = mysql.connector.connect(**db_config)
+            cursor = conn.cursor()
+            cursor.execute("USE attendance_tracking")
+            cursor.execute(query, (7,))
+            cursor.fetchall()
+            conn.close()
+
+        db_utils = DatabaseUtils(pool_size=1)
+
+        def pooled():
+            def select(conn):
+                cursor = conn.cursor(prepared=True)
+                cursor.execute(query, (7,))
+                cursor.fetchall()
+                cursor.close()
+            db_utils.run(select)
+
+    before = time_call(per_call, args.repeat)
+    after = time_call(pooled, args.repeat)
+    print(f"backend={args.backend} queries={args.repeat}")
+    print(f"{'connect per call ms':>20} {'pooled ms':>10}")
+    print(f"{before * 1e3:>20.3f} {after * 1e3:>10.3f}")
+
+
+SUBPROCESS_SESSION = """
+import sys
+from face_engine import FaceEngine, ModelRegistry
+models = ModelRegistry()
+FaceEngine(models, int(sys.argv[1])).close()
+models.close()
+"""
+
+
+def bench_startup(args):
+    # Time until a session for the subject is ready to read its first frame:
+    # a fresh interpreter per session (the old subprocess.run launch) against
+    # the resident service, which only rebuilds the subject's gallery.
+    import subprocess
+    import sys
+
+    def subprocess_session():
+        subprocess.run([sys.executable, "-c", SUBPROCESS_SESSION, str(args.subject_id)], check=True)
+
+    before = time_call(subprocess_session, args.repeat)
+
+    from recognition_service import RecognitionService
+
+    start = time.perf_counter()
+    service = RecognitionService()
+    load_time = time.perf_counter() - start
+    after = time_call(lambda: service.engine.load_subject(args.subject_id), args.repeat)
+    service.close()
+    print(f"subject={args.subject_id} sessions={args.repeat}")
+    print(f"{'subprocess s/session':>21} {'service load s':>15} {'service s/session':>18}")
+    print(f"{before:>21.2f} {load_time:>15.2f} {after:>18.3f}")
+
+
+def bench_tracker(args):
+    # BYTETracker.update per frame with N faces moving in step, and its Kalman
+    # work alone: the STrack path (gather the means, multi_predict, one
+    # scipy update per track) against predict and update on TrackStore rows.
+    from yolox.tracker.byte_tracker import BYTETracker
+    from yolox.tracker.track_store import tlwh_to_xyah
+
+    tracker_args = argparse.Namespace(track_thresh=0.5, track_buffer=30, match_thresh=0.7)
+    print(f"{'tracks':>7} {'update ms/frame':>16} {'per-track kf ms':>16} {'store kf ms':>12}")
+    for count in args.tracks:
+        columns = int(np.ceil(np.sqrt(count)))
+        grid = np.stack([np.arange(count) % columns, np.arange(count) // columns], axis=1) * 40.0
+        tracker = BYTETracker(tracker_args, frame_rate=30)
+
+        def next_frame():
+            top_left = grid + tracker.frame_id * 0.5
+            detections = np.c_[top_left, top_left + 30, np.full(count, 0.9)]
+            landmarks = top_left[:, None, :] + np.zeros((1, 5, 2))
+            tracker.update(detections, [480, 640], (480, 640), landmarks)
+
+        for _ in range(3):
+            next_frame()
+        update_time = time_call(next_frame, args.repeat)
+
+        store, kalman_filter, slots = tracker.store, tracker.kalman_filter, tracker.tracked_slots
+        measurement = tlwh_to_xyah(store.tlwh(slots))
+
+        def per_track():
+            mean = np.asarray([store.mean[slot].copy() for slot in slots])
+            covariance = np.asarray([store.covariance[slot] for slot in slots])
+            mean, covariance = kalman_filter.multi_predict(mean, covariance)
+            for i in range(len(slots)):
+                kalman_filter.update(mean[i], covariance[i], measurement[i])
+
+        def sliced():
+            mean, covariance = kalman_filter.multi_predict(store.mean[slots], store.covariance[slots])
+            kalman_filter.multi_update(mean, covariance, measurement)
+
+        before = time_call(per_track, args.repeat)
+        after = time_call(sliced, args.repeat)
+        print(f"{count:>7} {update_time * 1e3:>16.3f} {before * 1e3:>16.3f} {after * 1e3:>12.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Face recognition micro-benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    gallery_parser = subparsers.add_parser("gallery", help="Gallery search latency per query")
+    gallery_parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000, 100000])
+    gallery_parser.add_argument("--faces", type=int, default=8, help="Faces per frame for the batched query")
+    gallery_parser.add_argument("--templates", type=int, default=1, help="Enrollment images per identity")
+    gallery_parser.add_argument("--mode", choices=FaceGallery.SCORING_MODES, default="max")
+    gallery_parser.add_argument("--repeat", type=int, default=200)
+    gallery_parser.set_defaults(func=bench_gallery)
+
+    ann_parser = subparsers.add_parser("ann", help="IVF-PQ recall@1 and latency against brute force")
+    ann_parser.add_argument("--size", type=int, default=50000)
+    ann_parser.add_argument("--queries", type=int, default=500)
+    ann_parser.add_argument("--noise", type=float, default=0.5)
+    ann_parser.add_argument("--nlist", type=int, default=256)
+    ann_parser.add_argument("--m", type=int, default=64)
+    ann_parser.add_argument("--nprobe", type=int, default=16)
+    ann_parser.add_argument("--repeat", type=int, default=50)
+    ann_parser.set_defaults(func=bench_ann)
+
+    liveness_parser = subparsers.add_parser("liveness", help="Thread vs process liveness execution per frame")
+    liveness_parser.add_argument("--model", default=os.path.join("weights", "2.7_80x80_MiniFASNetV2.pth"))
+    liveness_parser.add_argument("--faces", type=int, nargs="+", default=[1, 5, 20])
+    liveness_parser.add_argument("--workers", type=int, default=min(8, os.cpu_count() or 1))
+    liveness_parser.add_argument("--crop-size", type=int, default=160)
+    liveness_parser.add_argument("--repeat", type=int, default=20)
+    liveness_parser.set_defaults(func=bench_liveness)
+
+    spoofing_parser = subparsers.add_parser("spoofing", help="MiniFASNet backend latency, memory and parity")
+    spoofing_parser.add_argument("--backends", nargs="+", default=["torch", "onnx"],
+                                 help="Backends to profile; the first one is the parity reference")
+    spoofing_parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 16])
+    spoofing_parser.add_argument("--repeat", type=int, default=50)
+    spoofing_parser.set_defaults(func=bench_spoofing)
+
+    frequency_parser = subparsers.add_parser("frequency", help="Full FFT vs fixed-patch rfft2 frequency check")
+    frequency_parser.add_argument("--crop-sizes", type=int, nargs="+", default=[64, 128, 256, 480])
+    frequency_parser.add_argument("--repeat", type=int, default=200)
+    frequency_parser.set_defaults(func=bench_frequency)
+
+    calibration_parser = subparsers.add_parser(
+        "frequency-calibration", help="Frequency statistics of real vs spoof face crops, per mode"
+    )
+    calibration_parser.add_argument("--real", default=os.path.join("faces", "*", "*.jpg"),
+                                    help="Glob of live face crops")
+    calibration_parser.add_argument("--spoof", help="Glob of printed or replayed face crops")
+    calibration_parser.set_defaults(func=calibrate_frequency)
+
+    features_parser = subparsers.add_parser("features", help="Per-check vs shared grayscale/Laplacian features")
+    features_parser.add_argument("--crop-sizes", type=int, nargs="+", default=[64, 128, 256, 480])
+    features_parser.add_argument("--repeat", type=int, default=200)
+    features_parser.set_defaults(func=bench_features)
+
+    db_parser = subparsers.add_parser("db", help="Connect-per-call vs pooled prepared queries")
+    db_parser.add_argument("--backend", choices=["sqlite", "mysql"], default="sqlite",
+                           help="sqlite needs no server; mysql uses db_config from database_utils")
+    db_parser.add_argument("--repeat", type=int, default=200)
+    db_parser.set_defaults(func=bench_db)
+
+    startup_parser = subparsers.add_parser("startup", help="Subprocess launch vs resident service session start")
+    startup_parser.add_argument("--subject-id", type=int, default=1)
+    startup_parser.add_argument("--repeat", type=int, default=3)
+    startup_parser.set_defaults(func=bench_startup)
+
+    tracker_parser = subparsers.add_parser("tracker", help="BYTETracker update and Kalman time per frame")
+    tracker_parser.add_argument("--tracks", type=int, nargs="+", default=[10, 100, 1000])
+    tracker_parser.add_argument("--repeat", type=int, default=50)
+    tracker_parser.set_defaults(func=bench_tracker)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,113 +1,209 @@
 import mysql.connector
+from mysql.connector import errors, pooling
+from contextlib import contextmanager
 from datetime import datetime
+import logging
+import threading
+import time
 import json
 import cv2
 import os
 from face_utils import FaceUtils
 BASE_DIR = r"D:\Git Project\Face-Recognition"
 
+# Can't connect (2002/2003), server gone away or connection lost (2006/2013).
+CONNECTION_ERRNOS = (2002, 2003, 2006, 2013)
+
+
+def is_connection_error(e):
+    # The server is down or went away, or the pool has no free connection;
+    # the same call can succeed on another connection.
+    if isinstance(e, (errors.OperationalError, errors.InterfaceError, errors.PoolError)):
+        return True
+    return isinstance(e, errors.DatabaseError) and e.errno in CONNECTION_ERRNOS
+
 class DatabaseUtils:
-    def __init__(self):
+    def __init__(self, embedding_cache=None, pool_size=None):
         self.db_config = db_config
+        self.pool_config = dict(pool_config)
+        if pool_size is not None:
+            self.pool_config["pool_size"] = pool_size
+        self.embedding_cache = embedding_cache
+        self.pool = None
+        self.pool_lock = threading.Lock()
+
+    def create_pool(self):
+        # The attendance writer thread and the video path can both ask for the
+        # first connection; the lock keeps them from building two pools.
+        with self.pool_lock:
+            if self.pool is None:
+                # The database is selected in db_config, so connections need no USE.
+                self.pool = pooling.MySQLConnectionPool(**self.pool_config, **self.db_config)
+            return self.pool
+
+    def get_connection(self):
+        # A pool that failed to come up (server down) is retried on next use.
+        conn = (self.pool or self.create_pool()).get_connection()
+        # Health check: idle pooled connections may have been dropped by the server.
+        try:
+            conn.ping(reconnect=True, attempts=3, delay=1)
+        except Exception:
+            # Hand the slot back, or failed pings drain the pool. Resetting a
+            # dead session can fail too; the pool takes the slot back anyway.
+            try:
+                conn.close()
+            except Exception as e:
+                logging.debug(f"Closing unreachable pooled connection: {e}")
+            raise
+        return conn
+
+    @contextmanager
+    def connection(self):
+        conn = self.get_connection()
+        try:
+            yield conn
+        finally:
+            conn.close()  # Returns the connection to the pool.
+
+    def run(self, fn, pool_wait=0.5):
+        # Runs fn(conn) on a pooled connection, retrying once on a fresh one if
+        # the server went away mid-call or the pool was momentarily exhausted.
+        try:
+            with self.connection() as conn:
+                return fn(conn)
+        except Exception as e:
+            if not is_connection_error(e):
+                raise
+            logging.warning(f"MySQL connection lost, retrying: {e}")
+            if isinstance(e, errors.PoolError):
+                time.sleep(pool_wait)
+            with self.connection() as conn:
+                return fn(conn)
 
     def log_attendance(self, created_at, status, student_id, subject_id):
-        conn = mysql.connector.connect(**self.db_config)
-        cursor = conn.cursor()
-        cursor.execute("USE attendance_tracking")
-
-        cursor.execute(
-            """
-            SELECT id FROM admin_system_attendance
-            WHERE student_id = %s AND subject_id = %s AND created_at = %s
-            """,
-            (student_id, subject_id, created_at),
-        )
-        existing_record = cursor.fetchone()
-
-        if existing_record:
-            print(
-                "Attendance already logged for this student and subject on this date."
-            )
-        else:
+        def log(conn):
+            cursor = conn.cursor(prepared=True)
             cursor.execute(
+                """
+                SELECT id FROM admin_system_attendance
+                WHERE student_id = %s AND subject_id = %s AND created_at = %s
+                """,
+                (student_id, subject_id, created_at),
+            )
+            existing_record = cursor.fetchone()
+
+            if existing_record:
+                print(
+                    "Attendance already logged for this student and subject on this date."
+                )
+            else:
+                cursor.execute(
+                    """
+                    INSERT INTO admin_system_attendance (created_at, status, student_id, subject_id)
+                    VALUES (%s, %s, %s, %s)
+                    """,
+                    (created_at, status, student_id, subject_id),
+                )
+                conn.commit()
+                print("Attendance logged successfully.")
+            cursor.close()
+
+        self.run(log)
+
+    def log_attendance_batch(self, records):
+        # records: (created_at, status, student_id, subject_id) tuples. The
+        # unique (student, subject, created_at) key from migration 0003 turns
+        # repeated check-ins into no-ops, while a Check-Out updates the day's
+        # row. A plain cursor is used on purpose: executemany rewrites it into
+        # a single multi-row INSERT, which a prepared cursor would not.
+        def log(conn):
+            cursor = conn.cursor()
+            cursor.executemany(
                 """
                 INSERT INTO admin_system_attendance (created_at, status, student_id, subject_id)
                 VALUES (%s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                    status = IF(VALUES(status) = 'Check-Out', VALUES(status), status)
                 """,
-                (created_at, status, student_id, subject_id),
+                records,
             )
             conn.commit()
-            print("Attendance logged successfully.")
+            cursor.close()
 
-        conn.close()
+        self.run(log)
 
     def save_face_to_db(self, name, enrollment_number, faculty, file_paths):
-        conn = mysql.connector.connect(**self.db_config)
-        cursor = conn.cursor()
-        cursor.execute("USE attendance_tracking")
-
-        cursor.execute(
-            """
-            SELECT id, faces FROM admin_system_student
-            WHERE enrollment_number = %s
-            """,
-            (enrollment_number,)
-        )
-        existing_record = cursor.fetchone()
-
-        if existing_record:
-            student_id, existing_faces = existing_record
-            if existing_faces:
-                existing_faces = json.loads(existing_faces)
-                for face_path in existing_faces:
-                    full_path = os.path.join(BASE_DIR, face_path)
-                    if os.path.exists(full_path):
-                        os.remove(full_path)
-                        print(f"Deleted old face image: {full_path}")
-
+        def save(conn):
+            cursor = conn.cursor(prepared=True)
             cursor.execute(
                 """
-                UPDATE admin_system_student
-                SET name = %s, faculty = %s, faces = %s
+                SELECT id, faces FROM admin_system_student
                 WHERE enrollment_number = %s
                 """,
-                (name, faculty, json.dumps(file_paths), enrollment_number)
+                (enrollment_number,)
             )
-            print("Student record updated successfully.")
-        else:
-            cursor.execute(
+            existing_record = cursor.fetchone()
+
+            if existing_record:
+                student_id, existing_faces = existing_record
+                if existing_faces:
+                    existing_faces = json.loads(existing_faces)
+                    for face_path in existing_faces:
+                        full_path = os.path.join(BASE_DIR, face_path)
+                        if os.path.exists(full_path):
+                            if self.embedding_cache is not None:
+                                self.embedding_cache.invalidate_file(full_path)
+                            os.remove(full_path)
+                            print(f"Deleted old face image: {full_path}")
+
+                cursor.execute(
+                    """
+                    UPDATE admin_system_student
+                    SET name = %s, faculty = %s, faces = %s
+                    WHERE enrollment_number = %s
+                    """,
+                    (name, faculty, json.dumps(file_paths), enrollment_number)
+                )
+                print("Student record updated successfully.")
+            else:
+                cursor.execute(
+                    """
+                    INSERT INTO admin_system_student (name, enrollment_number, faculty, faces)
+                    VALUES (%s, %s, %s, %s)
+                    """,
+                    (name, enrollment_number, faculty, json.dumps(file_paths))
+                )
+                print("Student record inserted successfully.")
+
+            conn.commit()
+            cursor.close()
+
+        self.run(save)
+
+    def load_faces_database(self, subject_id=None):
+        def load(conn):
+            cursor = conn.cursor(prepared=True, dictionary=True)
+            if subject_id is None:
+                # Campus-wide identification: every enrolled student.
+                cursor.execute("SELECT s.id, s.faces FROM admin_system_student AS s")
+            else:
+                query = """
+                    SELECT s.id, s.faces
+                    FROM admin_system_student AS s
+                    JOIN admin_system_enrollment AS e ON s.id = e.student_id
+                    WHERE e.subject_id = %s
                 """
-                INSERT INTO admin_system_student (name, enrollment_number, faculty, faces)
-                VALUES (%s, %s, %s, %s)
-                """,
-                (name, enrollment_number, faculty, json.dumps(file_paths))
-            )
-            print("Student record inserted successfully.")
-
-        conn.commit()
-        conn.close()
-        
-    def load_faces_database(self, subject_id):
-        conn = mysql.connector.connect(**self.db_config)
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("USE attendance_tracking")
-        
-        query = """
-            SELECT s.id, s.faces 
-            FROM admin_system_student AS s
-            JOIN admin_system_enrollment AS e ON s.id = e.student_id
-            WHERE e.subject_id = %s
-        """
-        cursor.execute(query, (subject_id,))
-        face_data = cursor.fetchall()
+                cursor.execute(query, (subject_id,))
+            face_data = cursor.fetchall()
+            cursor.close()
+            return face_data
 
+        face_data = self.run(load)
         for face in face_data:
             if face['faces']:
                 face['faces'] = json.loads(face['faces'])
             else:
                 face['faces'] = []
-
-        conn.close()
         return face_data
 
 
@@ -118,3 +214,9 @@ db_config = {
     'database': 'attendance_tracking',
     'port': 3306,
 }
+
+pool_config = {
+    'pool_name': 'attendance',
+    'pool_size': 4,
+    'pool_reset_session': True,
+}
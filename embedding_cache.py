@@ -0,0 +1,74 @@
+import os
+import hashlib
+import logging
+import numpy as np
+
+
+class EmbeddingCache:
+    def __init__(self, cache_dir, model_files, settings=""):
+        self.cache_dir = cache_dir
+        self.fingerprint = self.model_fingerprint(model_files, settings)
+        self.model_dir = os.path.join(cache_dir, self.fingerprint)
+        os.makedirs(self.model_dir, exist_ok=True)
+
+    @staticmethod
+    def model_fingerprint(model_files, settings=""):
+        # Hashing the weights themselves would cost as much as the work we are
+        # trying to skip, so identify each model by name, size and mtime.
+        digest = hashlib.sha1(settings.encode("utf-8"))
+        for model_file in model_files:
+            digest.update(os.path.basename(model_file).encode("utf-8"))
+            if os.path.exists(model_file):
+                stat = os.stat(model_file)
+                digest.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8"))
+        return digest.hexdigest()[:16]
+
+    @staticmethod
+    def content_hash(data):
+        return hashlib.sha1(data).hexdigest()
+
+    def entry_path(self, digest, model_dir=None):
+        return os.path.join(model_dir or self.model_dir, f"{digest}.npy")
+
+    def get(self, digest):
+        path = self.entry_path(digest)
+        if not os.path.exists(path):
+            return None
+        try:
+            return np.load(path)
+        except Exception as e:
+            logging.warning(f"Discarding unreadable embedding cache entry {path}: {e}")
+            self.remove(path)
+            return None
+
+    def put(self, digest, embedding):
+        path = self.entry_path(digest)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                np.save(f, np.asarray(embedding, dtype=np.float32))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"Failed to write embedding cache entry {path}: {e}")
+            self.remove(tmp_path)
+
+    def invalidate(self, digest):
+        # Entries computed by older model versions are dropped as well.
+        if not os.path.isdir(self.cache_dir):
+            return
+        for model_dir in os.listdir(self.cache_dir):
+            self.remove(self.entry_path(digest, os.path.join(self.cache_dir, model_dir)))
+
+    def invalidate_file(self, image_path):
+        try:
+            with open(image_path, "rb") as f:
+                self.invalidate(self.content_hash(f.read()))
+        except OSError as e:
+            logging.warning(f"Failed to invalidate embedding cache for {image_path}: {e}")
+
+    @staticmethod
+    def remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,73 @@
+import os
+import sys
+import logging
+import argparse
+import numpy as np
+from silentFaceSpoofing import INPUT_SIZE, MODEL_FILES, OnnxAntiSpoofing, SilentFaceAntiSpoofing
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+
+
+def export_onnx(torch_path, onnx_path, opset=13):
+    import torch
+
+    model = SilentFaceAntiSpoofing(torch_path).model.cpu().eval()
+    dummy = torch.zeros((1, 3, INPUT_SIZE[1], INPUT_SIZE[0]), dtype=torch.float32)
+    torch.onnx.export(
+        model,
+        dummy,
+        onnx_path,
+        input_names=["input"],
+        output_names=["output"],
+        dynamic_axes={"input": {0: "batch"}, "output": {0: "batch"}},
+        opset_version=opset,
+        do_constant_folding=True,
+    )
+    logging.info(f"Exported {torch_path} to {onnx_path}")
+
+
+def parity_crops(count=32, seed=0):
+    # Random crops of varying size so the resize path is exercised as well.
+    rng = np.random.default_rng(seed)
+    return [
+        rng.integers(0, 256, (int(rng.integers(60, 240)), int(rng.integers(60, 240)), 3), dtype=np.uint8)
+        for _ in range(count)
+    ]
+
+
+def check_parity(reference, candidate, face_crops, atol=1e-4):
+    # Compares per-face scores and real/fake decisions of two backends.
+    expected = reference.predict_scores(face_crops)
+    actual = candidate.predict_scores(face_crops)
+    max_diff = float(np.abs(expected - actual).max()) if len(face_crops) else 0.0
+    agreement = float(np.mean((expected > reference.threshold) == (actual > candidate.threshold)))
+    return max_diff <= atol and agreement == 1.0, max_diff, agreement
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export MiniFASNetV2 anti-spoofing weights to ONNX")
+    parser.add_argument("--weights", default=MODEL_FILES["torch"])
+    parser.add_argument("--output", default=MODEL_FILES["onnx"])
+    parser.add_argument("--opset", type=int, default=13)
+    parser.add_argument("--atol", type=float, default=1e-4, help="Allowed score difference against torch")
+    parser.add_argument("--skip-check", action="store_true", help="Do not compare against the torch model")
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    export_onnx(args.weights, args.output, args.opset)
+    if args.skip_check:
+        return
+
+    face_crops = parity_crops()
+    passed, max_diff, agreement = check_parity(
+        SilentFaceAntiSpoofing(args.weights), OnnxAntiSpoofing(args.output), face_crops, args.atol
+    )
+    logging.info(f"Parity on {len(face_crops)} crops: max score diff {max_diff:.2e}, "
+                 f"decision agreement {agreement:.1%}")
+    if not passed:
+        logging.error("ONNX model does not match the torch model.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+from face_engine.config import (
+    BASE_DIR, DETECTION_MODEL_FILE, FACE_DIRECTORY, RECOGNITION_MODEL_FILE, RecognitionArgs, TrackerArgs,
+)
+from face_engine.models import ModelRegistry
+from face_engine.liveness import AntiSpoofing
+from face_engine.engine import FaceEngine
+from face_engine.sessions import open_camera_while, run_attendance_session, run_enrollment_session
+
+__all__ = [
+    "AntiSpoofing",
+    "BASE_DIR",
+    "DETECTION_MODEL_FILE",
+    "FACE_DIRECTORY",
+    "FaceEngine",
+    "ModelRegistry",
+    "RECOGNITION_MODEL_FILE",
+    "RecognitionArgs",
+    "TrackerArgs",
+    "open_camera_while",
+    "run_attendance_session",
+    "run_enrollment_session",
+]
@@ -0,0 +1,52 @@
+import os
+
+TF_ENABLE_ONEDNN_OPTS = 0
+NO_ALBUMENTATIONS_UPDATE = 1
+BASE_DIR = r"D:\Git Project\Face-Recognition"
+FACE_DIRECTORY = os.path.join(BASE_DIR, "faces")
+DETECTION_MODEL_FILE = os.path.join(BASE_DIR, "weights/scrfd_2.5g_bnkps.onnx")
+RECOGNITION_MODEL_FILE = r"C:\Users\User\.insightface\models\buffalo_l\w600k_r50.onnx"
+
+
+class TrackerArgs:
+    def __init__(self):
+        self.fps = 60
+        self.track_thresh = 0.5
+        self.track_buffer = 30
+        self.match_thresh = 0.7
+        self.min_box_area = 10
+        self.aspect_ratio_thresh = 1.6
+
+
+class RecognitionArgs:
+    def __init__(self):
+        self.max_workers = min(8, os.cpu_count() or 1)
+        # "thread" keeps liveness in-process; "process" moves the model and the
+        # FFT/texture checks into worker processes to get around the GIL.
+        self.execution_mode = "thread"
+        # "torch" runs the .pth weights; "onnx" runs the export from
+        # export_anti_spoofing.py through onnxruntime without importing torch,
+        # and "onnx-int8" the quantized model from optimize_anti_spoofing.py.
+        self.anti_spoofing_backend = "torch"
+        # Liveness cascade: a track's verdict is reused for this many seconds,
+        # and once its hysteresis says "Real" these stages are skipped for up
+        # to confident_recheck_frames frames before the model runs again.
+        self.liveness_verdict_ttl = 0.5
+        self.confident_skip_stages = ("frequency", "model")
+        self.confident_recheck_frames = 10
+        # "full" runs the FFT on the crop at native resolution; "rfft" uses a
+        # fixed 64x64 real FFT whose cost does not grow with the face size.
+        self.frequency_mode = "full"
+        # "full" differences a 300x300 crop for the motion check; "roi" a 64x64
+        # ROI and lets a fast track skip it for a few frames once the pixels
+        # showed motion.
+        self.motion_mode = "full"
+        # A track is marked present after this many consistent recognitions.
+        self.attendance_confirmations = 3
+        # How a student's enrollment templates are scored: best single match
+        # ("max"), against their mean ("mean") or the mean of the top k ("topk").
+        self.gallery_mode = "max"
+        # "brute" scores the whole gallery; "ivfpq" shortlists candidates from
+        # an IVF-PQ index persisted per subject under cache/index for large
+        # galleries.
+        self.index_backend = "brute"
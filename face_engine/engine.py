@@ -0,0 +1,390 @@
+import os
+import cv2
+import logging
+import numpy as np
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor
+from yolox.tracker.byte_tracker import BYTETracker
+from face_utils import FaceUtils
+from face_gallery import FaceGallery
+from face_index import load_or_build_index, vectors_fingerprint
+from embedding_cache import EmbeddingCache
+from track_identity import TrackAttendance, TrackIdentityCache
+from frame_pipeline import FaceRecord, FrameContext
+from face_engine.config import BASE_DIR, TrackerArgs
+from face_engine.liveness import AntiSpoofing
+
+
+class FaceEngine:
+    # Detection, tracking, liveness, recognition and attendance for one camera
+    # stream, on models shared through a ModelRegistry. FramePipeline drives
+    # detect_and_track -> recognize -> render; handle_frame runs them inline.
+    def __init__(self, models, subject_id=None, attendance=True, anti_spoofing=None):
+        # Without a subject the gallery stays empty until load_subject(); with
+        # attendance=False (enrollment) recognized faces are never logged.
+        # Engines that never run at the same time can share one AntiSpoofing,
+        # and with it the liveness worker processes; its creator closes it.
+        self.models = models
+        self.recognition_args = models.recognition_args
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.recognition_args.max_workers, thread_name_prefix="face-worker"
+        )
+        self.face_detector = models.detector
+        self.recognition_model = models.recognizer
+        self.owns_anti_spoofing = anti_spoofing is None
+        if anti_spoofing is None:
+            model = None if self.recognition_args.execution_mode == "process" else models.anti_spoofing_model
+            anti_spoofing = AntiSpoofing(self.face_detector, self.recognition_args, model)
+        self.anti_spoofing = anti_spoofing
+        self.embedding_cache = models.embedding_cache
+        self.db_utils = models.db_utils
+        self.attendance_writer = models.attendance_writer if attendance else None
+        self.gallery_mode = self.recognition_args.gallery_mode
+        self.index_backend = self.recognition_args.index_backend
+        self.index = None
+        self.index_fingerprint = None
+        self.subject_id = subject_id
+        self.face_data = []
+        self.face_db = {}
+        self.gallery = FaceGallery(mode=self.gallery_mode)
+        self.reset_tracks()
+        if subject_id is not None:
+            models.profile.timed("face database and gallery", self.load_subject, subject_id)
+
+    @property
+    def profile(self):
+        return self.models.profile
+
+    @property
+    def face_saver(self):
+        return self.models.face_saver
+
+    def load_subject(self, subject_id):
+        # Starts a fresh session on the already loaded models: the subject's
+        # gallery is rebuilt (cached embeddings make that cheap) and every
+        # per-track state from the previous session is dropped, after its
+        # still-open tracks are checked out under the old subject.
+        self.end_tracks(set())
+        self.subject_id = subject_id
+        self.reload_gallery()
+        self.reset_tracks()
+
+    def reload_gallery(self):
+        # Also picks up faces enrolled during the session.
+        self.face_data = self.db_utils.load_faces_database(self.subject_id)
+        self.face_db = self.load_faces()
+        self.gallery = self.build_gallery()
+
+    def reset_tracks(self):
+        args = TrackerArgs()
+        self.tracker = BYTETracker(args, frame_rate=args.fps)
+        self.track_identities = TrackIdentityCache()
+        self.track_attendance = TrackAttendance(self.recognition_args.attendance_confirmations)
+        self.anti_spoofing.evict(set())
+        self.face_labels = {}
+        self.next_label = 1
+        self.check_in_mode = True
+
+    def end_tracks(self, active_track_ids):
+        # In check-out mode a student is checked out when their track ends;
+        # an empty set ends every track, as when the session stops.
+        for _, student_id, name in self.track_attendance.end(active_track_ids):
+            if not self.check_in_mode:
+                self.record_attendance(name, student_id, "Check-Out")
+
+    def record_attendance(self, name, id, status=None):
+        if self.attendance_writer is None:
+            return
+        current_time = date.today()
+        status = status or ("Present" if self.check_in_mode else "Check-Out")
+        if self.attendance_writer.submit(current_time, status, id, self.subject_id):
+            logging.info(f"Queued {status} for {name}")
+
+    def identify_faces(self, embeddings):
+        return self.identify_faces_batch(np.reshape(embeddings, (1, -1)))[0]
+
+    def identify_faces_batch(self, embeddings, matches=None):
+        # Matches are logged right away unless the caller passes a `matches`
+        # list, which then gets one (name, id) per embedding, or None where
+        # nobody matched; the pipeline debounces those per track.
+        if len(self.gallery) == 0:
+            if matches is not None:
+                matches.extend([None] * len(embeddings))
+            return [("Unknown", 0.0)] * len(embeddings)
+
+        results = []
+        for best_match_id, best_match, highest_similarity in self.gallery.best_match_batch(embeddings):
+            highest_similarity = max(highest_similarity, 0.0)
+            if highest_similarity > 0.6:
+                if matches is None:
+                    self.record_attendance(best_match, best_match_id)
+                else:
+                    matches.append((best_match, best_match_id))
+                results.append((best_match, highest_similarity))
+            else:
+                if matches is not None:
+                    matches.append(None)
+                results.append(("Unknown", highest_similarity))
+        return results
+
+    def build_gallery(self):
+        gallery = FaceGallery.from_face_db(self.face_db, mode=self.gallery_mode)
+        # "brute" scores the whole gallery exactly; other backends shortlist
+        # candidates from an index persisted next to the embedding cache.
+        if self.index_backend != "brute" and len(gallery) > 0:
+            # Reloads after an enrollment that left the vectors unchanged keep
+            # the index in memory instead of loading or training it again.
+            vectors = gallery.index_vectors()
+            fingerprint = vectors_fingerprint(vectors)
+            if fingerprint != self.index_fingerprint:
+                # Galleries are per subject, so each subject keeps its own
+                # index and switching subjects does not retrain over another's.
+                subject = "all" if self.subject_id is None else f"subject_{self.subject_id}"
+                index_path = os.path.join(
+                    BASE_DIR, "cache", "index", f"{self.index_backend}_{self.gallery_mode}", subject
+                )
+                self.index = load_or_build_index(self.index_backend, index_path, vectors)
+                self.index_fingerprint = fingerprint
+            gallery.attach_index(self.index)
+        return gallery
+
+    def load_faces(self):
+        face_db = {}
+
+        for entry in self.face_data:
+            if 'faces' not in entry:
+                continue
+            
+            id = entry['id']
+        
+            for image_path in entry['faces']:
+                person_name = os.path.basename(os.path.dirname(image_path))
+                full_path = os.path.join(BASE_DIR, image_path)
+                try:
+                    data = np.fromfile(full_path, dtype=np.uint8)
+                except OSError:
+                    data = np.empty(0, dtype=np.uint8)
+                if data.size == 0:
+                    print(f"Failed to load image: {full_path}")
+                    continue
+
+                digest = EmbeddingCache.content_hash(data.tobytes())
+                face = self.embedding_cache.get(digest)
+                success = face is not None
+                if not success:
+                    img = cv2.imdecode(data, cv2.IMREAD_COLOR)
+                    if img is None:
+                        print(f"Failed to load image: {full_path}")
+                        continue
+
+                    face, success = FaceUtils.get_face_embedding(
+                        self.face_detector, self.recognition_model, img
+                    )
+                    if success:
+                        self.embedding_cache.put(digest, face)
+                if success:
+                    key = (id, person_name)
+                    if key not in face_db:
+                        face_db[key] = []
+
+                    face_db[key].append(np.squeeze(face))
+                    print(f"Face embedding loaded for {person_name} from {full_path}.")
+                else:
+                    print(f"Failed to process face embedding for: {full_path}")
+
+        return face_db
+
+    def update_tracks(self, frame, detections, landmarks=None):
+        try:
+            img_info = [frame.shape[0], frame.shape[1]]
+            return self.tracker.update(
+                output_results=detections,
+                img_info=img_info,
+                img_size=(frame.shape[0], frame.shape[1]),
+                landmarks=landmarks,
+            )
+        except Exception as e:
+            logging.error(f"Error updating tracks: {e}")
+            return []
+
+    def get_face_embedding(self, img):
+        return FaceUtils.get_face_embedding(
+            self.face_detector, self.recognition_model, img
+        )
+
+    def handle_frame(self, frame):
+        context = self.recognize(self.detect_and_track(frame))
+        return self.render(context)
+
+    def detect_and_track(self, frame):
+        context = FrameContext(cv2.resize(frame, (640, 480)), frame)
+        try:    
+            detections, landmarks = self.face_detector.detect(context.frame, input_size=(128, 128))
+            logging.info(f"Detections: {detections}")
+            
+            if detections is None or len(detections) == 0:
+                # The tracker still advances on empty frames, so tracks of people
+                # who left age out and their check-outs fire.
+                logging.info("No faces detected.")
+                detections, landmarks = np.empty((0, 5)), None
+            detections = np.array(detections)
+            tracked_faces = self.update_tracks(context.frame, detections, landmarks)
+            self.update_face_labels(tracked_faces)
+            context.frame_id = self.tracker.frame_id
+            context.active_track_ids = self.active_track_ids()
+
+            for tracked_face in tracked_faces:
+                x1, y1, w, h = map(int, tracked_face.tlwh[:4])
+                x2, y2 = x1 + w, y1 + h
+                if x2 <= x1 or y2 <= y1:
+                    logging.warning(f"Invalid bounding box for tracker ID {tracked_face.track_id}, skipping.")
+                    continue
+                
+                tracker_id = tracked_face.track_id
+                context.faces.append(FaceRecord(
+                    self.face_labels.get(tracker_id, "Unknown"),
+                    tracker_id,
+                    tracked_face.tlwh.copy(),
+                    (x1, y1, x2, y2),
+                    context.frame[y1:y2, x1:x2],
+                    tracked_face.landmarks,
+                    tracked_face.mean[4:].copy(),
+                ))
+        except Exception as e:
+            logging.error(f"Error handling frame: {e}")
+        return context
+
+    def recognize(self, context):
+        try:
+            if context.active_track_ids is not None:
+                self.track_identities.evict(context.active_track_ids)
+                self.anti_spoofing.evict(context.active_track_ids)
+                # The one-shot attendance events are queued here rather than in
+                # render, whose frames the pipeline may drop.
+                self.end_tracks(context.active_track_ids)
+
+            pending = []
+            for face in context.faces:
+                cached = self.track_identities.lookup(face.track_id, face.tlwh, context.frame_id)
+                if cached is not None:
+                    name, confidence, face.student_id = cached
+                    face.decision, face.identity = "Real", (name, confidence)
+                else:
+                    pending.append(face)
+
+            checks = [(face.crop, context.frame, face.bbox, face.track_id, face.velocity) for face in pending]
+            liveness = self.anti_spoofing.liveness_check_batch(checks, self.executor)
+            for face, (_, decision) in zip(pending, liveness):
+                face.decision = decision
+
+            real_faces = [face for face in pending if face.decision == "Real"]
+            self.identify_real_faces(context.frame, real_faces)
+            for face in pending:
+                # One check-in per track, once enough fresh recognitions in a
+                # row matched the same student; Unknown and spoofed faces reset
+                # the count, and cached frames neither count nor reset it.
+                student_id = face.student_id if face.decision == "Real" else None
+                name = face.identity[0] if face.identity is not None else None
+                if self.track_attendance.observe(face.track_id, student_id, name) and self.check_in_mode:
+                    self.record_attendance(name, student_id, "Present")
+                self.remember_identity(face, context.frame_id)
+        except Exception as e:
+            logging.error(f"Error recognizing faces: {e}")
+        for face in context.faces:
+            face.annotation = self.describe_face(face.label, face.decision, face.identity)
+        return context
+
+    def render(self, context):
+        return self.draw_face_annotations(context.frame, context.faces)
+
+    def draw_face_annotations(self, frame, faces):
+        for face in faces:
+            if face.annotation is None:
+                continue
+            x1, y1, x2, y2 = face.bbox
+            color, label = face.annotation
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+            cv2.putText(frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+        return frame
+
+    def close(self):
+        # The registry owns the shared models and the attendance writer.
+        self.executor.shutdown(wait=False)
+        if self.owns_anti_spoofing:
+            self.anti_spoofing.close()
+
+    def identify_real_faces(self, frame, faces):
+        # One batched ArcFace pass for every face aligned from the landmarks its
+        # track carried over from the frame-level SCRFD pass. Sets each face's
+        # identity and, when it matched a student, its student_id.
+        batch = [face for face in faces if face.landmarks is not None]
+        embeddings, success = FaceUtils.get_face_embeddings(
+            self.recognition_model, frame, [face.landmarks for face in batch]
+        )
+        if success:
+            self.assign_identities(batch, embeddings)
+        for face in faces:
+            if face.landmarks is None:
+                face_embedding, success = self.get_face_embedding(face.crop)
+                if success:
+                    self.assign_identities([face], np.reshape(face_embedding, (1, -1)))
+
+    def assign_identities(self, faces, embeddings):
+        matches = []
+        identities = self.identify_faces_batch(embeddings, matches)
+        for face, identity, match in zip(faces, identities, matches):
+            face.identity = identity
+            face.student_id = match[1] if match is not None else None
+
+    def remember_identity(self, face, frame_id):
+        # Recognized students skip liveness and recognition on later frames
+        # until TrackIdentityCache schedules a re-check for their track. Only
+        # tracks confirmed by TrackAttendance are cached, so the confirming
+        # recognitions are all fresh ones.
+        if face.decision == "Real" and self.track_attendance.is_confirmed(face.track_id, face.student_id):
+            self.track_identities.confirm(
+                face.track_id, face.identity[0], face.identity[1], face.tlwh, frame_id,
+                student_id=face.student_id,
+            )
+        elif face.decision != "Real":
+            self.track_identities.discard(face.track_id)
+
+    def active_track_ids(self):
+        return self.tracker.active_track_ids()
+
+    def update_face_labels(self, tracked_faces):
+        current_ids = {face.track_id for face in tracked_faces}
+        self.face_labels = {
+            track_id: label for track_id, label in self.face_labels.items() if track_id in current_ids
+        }
+
+        for face in tracked_faces:
+            if face.track_id not in self.face_labels:
+                self.face_labels[face.track_id] = f"face_{self.next_label}"
+                self.next_label += 1
+
+        sorted_labels = sorted(self.face_labels.items(), key=lambda x: x[0])
+        self.face_labels = {k: f"face_{i+1}" for i, (k, _) in enumerate(sorted_labels)}
+
+    def describe_face(self, face_label, decision, identity):
+        if decision == "No Motion":
+            color = (0, 0, 255)
+            label = f"{face_label}: Fake (No Motion)"
+        elif decision == "Low Clarity":
+            color = (0, 255, 255)
+            label = f"{face_label}: Fake (Low Clarity)"
+        elif decision == "Fake":
+            color = (0, 0, 255)
+            label = f"{face_label}: Fake"
+        elif decision == "Real":
+            if identity is not None:
+                name, similarity = identity
+                color = (0, 255, 0)
+                label = f"{name} ({similarity:.2f})" if name != "Unknown" else "Real"
+            else:
+                color = (255, 255, 0)
+                label = "Undecided"
+        else:
+            color = (255, 255, 0)
+            label = str(decision)
+        return color, label
@@ -0,0 +1,212 @@
+import os
+import time
+import logging
+import collections
+from silentFaceSpoofing import MODEL_FILES, load_anti_spoofing_model
+from motion_clarity_utils import CropFeatures, MotionClarityUtils
+from liveness_pool import ProcessLivenessPool
+from liveness_cascade import CascadeStage, LivenessCascade
+from face_engine.config import BASE_DIR, RecognitionArgs
+
+
+class AntiSpoofing:
+    def __init__(self, face_detector, recognition_args=None, model=None):
+        # `model` is a preloaded anti-spoofing model, e.g. from ModelRegistry;
+        # without one the backend's model is loaded here.
+        self.face_detector = face_detector
+        recognition_args = recognition_args or RecognitionArgs()
+        backend = recognition_args.anti_spoofing_backend
+        model_path = os.path.join(BASE_DIR, MODEL_FILES[backend])
+        self.motion_clarity_utils = MotionClarityUtils(
+            frequency_mode=recognition_args.frequency_mode, motion_mode=recognition_args.motion_mode
+        )
+        self.process_pool = None
+        if recognition_args.execution_mode == "process":
+            # Stateful motion/clarity history stays in this process; the model
+            # and the stateless texture/frequency checks run in the pool.
+            self.process_pool = ProcessLivenessPool(
+                model_path, recognition_args.max_workers, backend=backend,
+                frequency_mode=recognition_args.frequency_mode,
+            )
+            self.anti_spoofing_model = self.process_pool
+            self.stateless_checks = self.process_pool
+        else:
+            self.anti_spoofing_model = model or load_anti_spoofing_model(backend, model_path)
+            self.stateless_checks = self.motion_clarity_utils
+        self.face_buffers = {}
+        self.current_decisions = {}
+        self.real_threshold = 0.7
+        self.fake_threshold = 0.3
+        self.hysteresis_margin = 0.1
+        self.failure_counter = {}
+        self.failure_threshold = 3
+        self.confident_skips = {}
+        self.confident_skip_stages = set(recognition_args.confident_skip_stages)
+        self.confident_recheck_frames = recognition_args.confident_recheck_frames
+        self.cascade = LivenessCascade(
+            [
+                # Motion and clarity keep per-track history, so they always run
+                # first; only the stateless stages are reordered.
+                CascadeStage("motion", self.check_motion, reorder=False),
+                CascadeStage("clarity", self.check_clarity, reorder=False),
+                CascadeStage("texture", self.check_texture),
+                CascadeStage("frequency", self.check_frequency),
+            ],
+            verdict_ttl=recognition_args.liveness_verdict_ttl,
+        )
+
+    def update_buffer(self, face_id, is_real):
+        if face_id not in self.face_buffers:
+            self.face_buffers[face_id] = collections.deque(maxlen=5)
+        self.face_buffers[face_id].append(is_real)
+
+    def update_decision(self, face_id):
+        if len(self.face_buffers[face_id]) < self.face_buffers[face_id].maxlen:
+            return None
+        weights = [1, 1, 1.5, 2, 2.5]
+        weighted_sum = sum(w * result for w, result in zip(weights, self.face_buffers[face_id]))
+        total_weight = sum(weights)
+        weighted_average = weighted_sum / total_weight
+
+        logging.info(f"Weighted Average for {face_id}: {weighted_average:.2f}")
+
+        if self.current_decisions.get(face_id) == "Real":
+            if weighted_average < self.fake_threshold + self.hysteresis_margin:
+                self.current_decisions[face_id] = "Fake"
+        elif self.current_decisions.get(face_id) == "Fake":
+            if weighted_average > self.real_threshold - self.hysteresis_margin:
+                self.current_decisions[face_id] = "Real"
+        else:
+            if weighted_average > self.real_threshold:
+                self.current_decisions[face_id] = "Real"
+            elif weighted_average < self.fake_threshold:
+                self.current_decisions[face_id] = "Fake"
+
+        logging.info(f"Final Decision for {face_id}: {self.current_decisions.get(face_id)}")
+        return self.current_decisions.get(face_id)
+
+    def is_confident(self, face_id):
+        return (
+            self.current_decisions.get(face_id) == "Real"
+            and self.confident_skips.get(face_id, 0) < self.confident_recheck_frames
+        )
+
+    def check_motion(self, features, frame, bbox, face_id, velocity):
+        if not self.motion_clarity_utils.check_motion(
+            frame, bbox=bbox, track_id=face_id, features=features, velocity=velocity
+        ):
+            logging.info(f"Face {face_id} failed motion check (relaxed).")
+            return False, "No Motion"
+        return None
+
+    def check_clarity(self, features, frame, bbox, face_id, velocity):
+        clarity_valid, clarity_score = self.motion_clarity_utils.check_clarity(features, track_id=face_id)
+        if not clarity_valid:
+            logging.info(f"Face {face_id} failed clarity check with score {clarity_score:.2f}.")
+            return False, "Fake"
+        return None
+
+    def check_texture(self, features, frame, bbox, face_id, velocity):
+        if not self.stateless_checks.analyze_texture(features):
+            return False, "Fake"
+        return None
+
+    def check_frequency(self, features, frame, bbox, face_id, velocity):
+        if not self.stateless_checks.analyze_frequency(features):
+            return False, "Fake"
+        return None
+
+    def pre_checks(self, face_crop, frame, bbox, face_id, velocity=None, skip=()):
+        # Cheap gates run through the cascade before the model; returns
+        # (False, decision) from the first stage that rejects, else None.
+        # The stages share one CropFeatures, so grayscale and Laplacian
+        # statistics are computed once per face.
+        try:
+            if face_id not in self.failure_counter:
+                self.failure_counter[face_id] = 0
+            failed = self.cascade.run(CropFeatures(face_crop), frame, bbox, face_id, velocity, skip=skip)
+            if failed is not None:
+                self.failure_counter[face_id] += 1
+            return failed
+
+        except Exception as e:
+            logging.error(f"Error in liveness check for {face_id}: {e}")
+            return False, "Error"
+
+    def model_decision(self, is_real, face_id):
+        self.update_buffer(face_id, is_real)
+        self.update_decision(face_id)
+        self.confident_skips[face_id] = 0
+        if not is_real:
+            logging.info(f"Face {face_id} classified as Fake by anti-spoofing model.")
+            return False, "Fake"
+
+        # Step 4: Return real status if all checks pass
+        logging.info(f"Face {face_id} passed all liveness checks and classified as Real.")
+        self.failure_counter[face_id] = 0
+        return True, "Real"
+
+    def liveness_check(self, face_crop, frame, bbox, face_id):
+        return self.liveness_check_batch([(face_crop, frame, bbox, face_id)])[0]
+
+    def liveness_check_batch(self, checks, executor=None):
+        # checks holds (face_crop, frame, bbox, face_id[, velocity]) tuples,
+        # velocity being the track's Kalman velocity when known. Tracks with a
+        # fresh cached verdict are answered directly; the rest run the cascade
+        # per face (on the executor when given), and every face that passes it
+        # is scored by MiniFASNet in a single batched forward pass.
+        results = [self.cascade.cached_verdict(check[3]) for check in checks]
+        pending = [i for i, cached in enumerate(results) if cached is None]
+        skips = {
+            i: self.confident_skip_stages if self.is_confident(checks[i][3]) else ()
+            for i in pending
+        }
+        if executor is not None:
+            pre_results = list(executor.map(lambda i: self.pre_checks(*checks[i], skip=skips[i]), pending))
+        else:
+            pre_results = [self.pre_checks(*checks[i], skip=skips[i]) for i in pending]
+
+        survivors = []
+        for i, failed in zip(pending, pre_results):
+            face_id = checks[i][3]
+            if failed is not None:
+                results[i] = failed
+            elif "model" in skips[i]:
+                # Hysteresis already holds confident "Real" evidence for this track.
+                self.confident_skips[face_id] = self.confident_skips.get(face_id, 0) + 1
+                self.failure_counter[face_id] = 0
+                self.cascade.skip("model")
+                results[i] = (True, "Real")
+            else:
+                survivors.append(i)
+
+        if survivors:
+            start_time = time.perf_counter()
+            try:
+                predictions = self.anti_spoofing_model.predict_batch([checks[i][0] for i in survivors])
+                self.cascade.record(
+                    "model", time.perf_counter() - start_time,
+                    rejected=sum(not is_real for is_real in predictions), calls=len(survivors),
+                )
+                for i, is_real in zip(survivors, predictions):
+                    results[i] = self.model_decision(is_real, checks[i][3])
+            except Exception as e:
+                logging.error(f"Error in batched liveness check: {e}")
+                for i in survivors:
+                    results[i] = (False, "Error")
+
+        for i in pending:
+            self.cascade.store_verdict(checks[i][3], results[i])
+        return results
+
+    def evict(self, active_track_ids):
+        # Liveness history is keyed by track_id; drop it once the track is gone.
+        for state in (self.face_buffers, self.current_decisions, self.failure_counter, self.confident_skips):
+            for face_id in [f for f in state if f not in active_track_ids]:
+                del state[face_id]
+        self.motion_clarity_utils.evict(active_track_ids)
+        self.cascade.evict(active_track_ids)
+
+    def close(self):
+        if self.process_pool is not None:
+            self.process_pool.close()
@@ -0,0 +1,98 @@
+import os
+import importlib
+import threading
+from silentFaceSpoofing import MODEL_FILES, load_anti_spoofing_model
+from database_utils import DatabaseUtils
+from embedding_cache import EmbeddingCache
+from attendance_writer import AttendanceWriter
+from face_saver import FaceSaver, build_augmentation_pipeline
+from startup_profile import StartupProfile
+from face_engine.config import BASE_DIR, DETECTION_MODEL_FILE, RECOGNITION_MODEL_FILE, RecognitionArgs
+
+
+class ModelRegistry:
+    # Every model and shared resource of the engine, loaded once per process
+    # on first use. Engines built on the same registry (attendance session,
+    # enrollment, the recognition service) share the warm instances.
+    def __init__(self, recognition_args=None, profile=None,
+                 detection_model_file=DETECTION_MODEL_FILE, recognition_model_file=RECOGNITION_MODEL_FILE):
+        self.recognition_args = recognition_args or RecognitionArgs()
+        self.profile = profile or StartupProfile(enabled=False)
+        self.detection_model_file = detection_model_file
+        self.recognition_model_file = recognition_model_file
+        self.models = {}
+        self.lock = threading.RLock()
+
+    def get(self, name, loader, *requires):
+        # `requires` names registry entries passed to the loader; they are
+        # resolved before its timing starts, so each profile line is one component.
+        with self.lock:
+            if name not in self.models:
+                args = [getattr(self, required) for required in requires]
+                self.models[name] = self.profile.timed(name, loader, *args)
+            return self.models[name]
+
+    @property
+    def insightface(self):
+        return self.get("import insightface", lambda: importlib.import_module("insightface"))
+
+    @property
+    def detector(self):
+        return self.get("detector", self.load_detector, "insightface")
+
+    @property
+    def recognizer(self):
+        return self.get("recognizer", self.load_recognizer, "insightface")
+
+    @property
+    def anti_spoofing_model(self):
+        # Includes importing torch or onnxruntime. Not used in "process"
+        # execution mode, where the model lives in the worker processes.
+        backend = self.recognition_args.anti_spoofing_backend
+        return self.get(
+            f"anti-spoofing ({backend})",
+            lambda: load_anti_spoofing_model(backend, os.path.join(BASE_DIR, MODEL_FILES[backend])),
+        )
+
+    @property
+    def embedding_cache(self):
+        return self.get("embedding cache", lambda: EmbeddingCache(
+            os.path.join(BASE_DIR, "cache", "embeddings"),
+            [self.detection_model_file, self.recognition_model_file],
+            settings="input_size=128x128",
+        ))
+
+    @property
+    def db_utils(self):
+        return self.get("database", DatabaseUtils, "embedding_cache")
+
+    @property
+    def attendance_writer(self):
+        return self.get("attendance writer", lambda db_utils: AttendanceWriter(db_utils).start(), "db_utils")
+
+    @property
+    def face_saver(self):
+        # Enrollment-only, so attendance runs never build the augmentation pipeline.
+        return self.get(
+            "face saver",
+            lambda detector, recognizer, db_utils: FaceSaver(
+                detector, build_augmentation_pipeline(), recognizer, db_utils
+            ),
+            "detector", "recognizer", "db_utils",
+        )
+
+    def load_detector(self, insightface):
+        face_detector = insightface.model_zoo.SCRFD(model_file=self.detection_model_file)
+        face_detector.prepare(ctx_id=0, input_size=(128, 128))
+        return face_detector
+
+    def load_recognizer(self, insightface):
+        recognition_model = insightface.model_zoo.get_model(self.recognition_model_file)
+        recognition_model.prepare(ctx_id=0)
+        return recognition_model
+
+    def close(self):
+        with self.lock:
+            writer = self.models.pop("attendance writer", None)
+        if writer is not None:
+            writer.close()
@@ -0,0 +1,159 @@
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+from frame_pipeline import FramePipeline
+from face_engine.config import FACE_DIRECTORY
+
+
+def open_camera_while(build, profile, camera_index=0):
+    # Opening the webcam takes about as long as loading a model, so it
+    # happens while build() loads the models. Returns (build(), cap).
+    with ThreadPoolExecutor(max_workers=1) as camera_loader:
+        camera = camera_loader.submit(profile.timed, "camera", cv2.VideoCapture, camera_index)
+        result = build()
+        return result, camera.result()
+
+
+def run_attendance_session(engine, cap, face_directory=FACE_DIRECTORY, stop_event=None, display=True):
+    # The camera loop of one attendance session. The recognition service
+    # calls it with a stop_event to end sessions without a key press, and
+    # with display=False: HighGUI windows only work from the main thread.
+    cap.set(cv2.CAP_PROP_AUTOFOCUS, 1)
+    cap.set(cv2.CAP_PROP_FOCUS, 70)
+
+    if display:
+        logging.info(
+            "Press 'q' to quit. Press 'c' to switch between check-in and check-out."
+        )
+    pipeline = FramePipeline(engine, cap).start()
+    last_frame_time = time.time()
+    last_stats_time = last_frame_time
+    key = 0xFF
+    while True:
+        context = pipeline.get(timeout=0.1)
+        if display:
+            key = cv2.waitKey(1) & 0xFF
+        if stop_event is not None and stop_event.is_set():
+            break
+        if context is None:
+            if not pipeline.running:
+                break
+            if key == ord('q'):
+                break
+            continue
+        engine.profile.report()
+        current_time = time.time()
+        if current_time - last_stats_time > 10:
+            pipeline.log_stats()
+            engine.anti_spoofing.cascade.log_stats()
+            last_stats_time = current_time
+        if not display:
+            continue
+
+        annotated_frame = context.frame
+        if key == ord('s'):
+            number = input("Enter enrollment number: ")
+            name = input("Enter name for the new face: ")
+            engine.face_saver.save_face(name, number, context.original_frame, face_directory, pipeline.capture)
+            engine.reload_gallery()
+
+        if key == ord('c'):
+            engine.check_in_mode = not engine.check_in_mode
+            mode = "Check-In" if engine.check_in_mode else "Check-Out"
+            logging.info(f"Switched to {mode} mode")
+        fps = 1 / max(current_time - last_frame_time, 1e-6)
+        last_frame_time = current_time
+        cv2.putText(
+            annotated_frame,
+            f"FPS: {fps:.2f}",
+            (10, 30),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            1,
+            (0, 255, 0),
+            2,
+        )
+        mode_text = "Check-In" if engine.check_in_mode else "Check-Out"
+        cv2.putText(
+            annotated_frame,
+            f"Mode: {mode_text}",
+            (10, 60),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            1,
+            (0, 255, 0),
+            2,
+        )
+        cv2.imshow("Face Tracking", annotated_frame)
+        if key == ord('q'):
+            break
+    pipeline.stop()
+    # Students still in view when the session stops are checked out too.
+    engine.end_tracks(set())
+    pipeline.log_stats()
+    engine.anti_spoofing.cascade.log_stats()
+    if display:
+        cv2.destroyAllWindows()
+
+
+def run_enrollment_session(engine, cap, name, enrollment_number, faculty,
+                           face_directory=FACE_DIRECTORY, stop_event=None, display=True):
+    # Shows the tracked camera stream until 's' saves the student's faces or
+    # 'q' quits. Without a display the faces are saved on the first frame
+    # with a face that passed liveness.
+    cap.set(cv2.CAP_PROP_AUTOFOCUS, 1)
+    cap.set(cv2.CAP_PROP_FOCUS, 70)
+
+    while stop_event is None or not stop_event.is_set():
+        start_time = time.time()
+        ret, frame = cap.read()
+        if not ret:
+            logging.error("Failed to grab frame.")
+            break
+        original_frame = frame.copy()
+        context = engine.recognize(engine.detect_and_track(frame))
+        if not display:
+            if any(face.decision == "Real" for face in context.faces):
+                engine.face_saver.save_face_web(name, enrollment_number, faculty, original_frame, face_directory, cap)
+                break
+            continue
+        annotated_frame = engine.render(context)
+
+        cv2.putText(
+            annotated_frame,
+            "Press S to save cropped face",
+            (10, 60),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.6,
+            (0, 255, 0),
+            1,
+        )
+        cv2.putText(
+            annotated_frame,
+            "Press Q to exit",
+            (10, 80),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.6,
+            (0, 255, 0),
+            1,
+        )
+        elapsed_time = time.time() - start_time
+        fps = 1 / max(elapsed_time, 1e-6)
+        cv2.putText(
+            annotated_frame,
+            f"FPS: {fps:.2f}",
+            (10, 30),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            1,
+            (0, 255, 0),
+            2,
+        )
+        cv2.imshow("Face Tracking", annotated_frame)
+        key = cv2.waitKey(1) & 0xFF
+        if key == ord('s'):
+            engine.face_saver.save_face_web(name, enrollment_number, faculty, original_frame, face_directory, cap)
+            break
+        if key == ord('q'):
+            break
+    cap.release()
+    if display:
+        cv2.destroyAllWindows()
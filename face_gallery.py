@@ -0,0 +1,167 @@
+import numpy as np
+from face_index import normalize_rows, top_k
+
+
+class FaceGallery:
+    SCORING_MODES = ("max", "mean", "topk")
+
+    def __init__(self, dim=512, mode="max", top_k=3):
+        if mode not in self.SCORING_MODES:
+            raise ValueError(f"Unknown scoring mode: {mode}")
+        self.dim = dim
+        self.mode = mode
+        self.top_k = top_k
+        self.index = None
+        self.index_candidates = 64
+        self.build({})
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def num_templates(self):
+        return len(self.embeddings)
+
+    normalize_rows = staticmethod(normalize_rows)
+
+    @classmethod
+    def from_face_db(cls, face_db, dim=512, mode="max", top_k=3):
+        gallery = cls(dim=dim, mode=mode, top_k=top_k)
+        gallery.build(face_db)
+        return gallery
+
+    def build(self, face_db):
+        # face_db maps (id, name) to one embedding or a list of per-image
+        # embeddings; every template is kept, grouped by identity.
+        keys = [key for key in face_db if len(face_db[key]) > 0]
+        templates = [
+            np.asarray(face_db[key], dtype=np.float32).reshape(-1, self.dim) for key in keys
+        ]
+        counts = np.array([len(t) for t in templates], dtype=np.int64)
+
+        self.ids = np.array([key[0] for key in keys], dtype=object)
+        self.names = np.array([key[1] for key in keys], dtype=object)
+        if templates:
+            self.embeddings = np.ascontiguousarray(self.normalize_rows(np.vstack(templates)))
+        else:
+            self.embeddings = np.empty((0, self.dim), dtype=np.float32)
+        self.owners = np.repeat(np.arange(len(keys)), counts)
+        self.counts = counts
+        self.offsets = np.concatenate(([0], np.cumsum(counts)[:-1])).astype(np.int64) if len(keys) else counts
+        self._build_aggregates()
+        self.index = None
+        return self
+
+    def _build_aggregates(self):
+        n_ids = len(self.ids)
+        if n_ids == 0:
+            self.centroids = np.empty((0, self.dim), dtype=np.float32)
+            self.slots = np.empty((0, 0), dtype=np.int64)
+            return
+
+        sums = np.add.reduceat(self.embeddings, self.offsets, axis=0)
+        self.centroids = np.ascontiguousarray(self.normalize_rows(sums))
+
+        # Padded (identity x template) lookup used by top-k scoring; -1 marks padding.
+        max_templates = int(self.counts.max())
+        positions = np.arange(self.num_templates) - self.offsets[self.owners]
+        self.slots = np.full((n_ids, max_templates), -1, dtype=np.int64)
+        self.slots[self.owners, positions] = np.arange(self.num_templates)
+
+    def add(self, id, name, embedding):
+        rows = self.normalize_rows(np.asarray(embedding, dtype=np.float32).reshape(-1, self.dim))
+        matches = np.flatnonzero((self.ids == id) & (self.names == name))
+        if len(matches):
+            owner = int(matches[0])
+        else:
+            owner = len(self.ids)
+            self.ids = np.append(self.ids, np.array([id], dtype=object))
+            self.names = np.append(self.names, np.array([name], dtype=object))
+
+        owners = np.concatenate((self.owners, np.full(len(rows), owner)))
+        embeddings = np.vstack((self.embeddings, rows))
+        order = np.argsort(owners, kind="stable")
+        self.embeddings = np.ascontiguousarray(embeddings[order])
+        self.owners = owners[order]
+        self.counts = np.bincount(self.owners, minlength=len(self.ids)).astype(np.int64)
+        self.offsets = np.concatenate(([0], np.cumsum(self.counts)[:-1])).astype(np.int64)
+        self._build_aggregates()
+        self.index = None
+
+    def index_vectors(self):
+        # Rows an approximate index should be built over for the current mode.
+        return self.centroids if self.mode == "mean" else self.embeddings
+
+    def attach_index(self, index, candidates=64):
+        # The index only shortlists candidates; they are re-scored exactly below.
+        self.index = index
+        self.index_candidates = candidates
+
+    def similarities(self, queries, identities=None):
+        # Per-identity scores of shape (num_queries, num_identities), or
+        # (num_queries, len(identities)) when restricted to a subset.
+        queries = self.normalize_rows(queries)
+        if self.mode == "mean":
+            centroids = self.centroids if identities is None else self.centroids[identities]
+            return queries @ centroids.T
+
+        if identities is None:
+            template_scores = queries @ self.embeddings.T
+            if self.mode == "max":
+                return np.maximum.reduceat(template_scores, self.offsets, axis=1)
+            slots, counts = self.slots, self.counts
+            padded = template_scores[:, np.maximum(slots, 0)]
+        else:
+            slots, counts = self.slots[identities], self.counts[identities]
+            padded = np.einsum("qd,ctd->qct", queries, self.embeddings[np.maximum(slots, 0)])
+        padded[:, slots < 0] = -np.inf
+        if self.mode == "max":
+            return padded.max(axis=2)
+
+        k = min(self.top_k, slots.shape[1])
+        top = -np.partition(-padded, k - 1, axis=2)[:, :, :k]
+        top[np.isinf(top)] = 0.0
+        return top.sum(axis=2) / np.minimum(counts, k)
+
+    def search_batch(self, queries, k=1):
+        # Returns (identity indices, scores), each of shape (num_queries, k), best
+        # first; rows the index could not fill are padded with -1 / -inf.
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        if len(self) == 0 or len(queries) == 0:
+            return top_k(np.empty((len(queries), 0), dtype=np.float32), k)
+        if self.index is None:
+            return top_k(self.similarities(queries), k)
+
+        k = min(k, len(self))
+        indices = np.full((len(queries), k), -1, dtype=np.int64)
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        rows, _ = self.index.search(queries, k=self.index_candidates)
+        for qi, query_rows in enumerate(rows):
+            query_rows = query_rows[query_rows >= 0]
+            if len(query_rows) == 0:
+                continue
+            identities = query_rows if self.mode == "mean" else np.unique(self.owners[query_rows])
+            top, top_scores = top_k(self.similarities(queries[qi], identities), k)
+            indices[qi, :top.shape[1]] = identities[top[0]]
+            scores[qi, :top.shape[1]] = top_scores[0]
+        return indices, scores
+
+    def search(self, query, k=1):
+        indices, scores = self.search_batch(query, k=k)
+        return [
+            (self.ids[i], self.names[i], float(s))
+            for i, s in zip(indices[0], scores[0])
+            if i >= 0
+        ]
+
+    def best_match_batch(self, queries):
+        # One (id, name, similarity) per query; id/name are None on an empty gallery.
+        indices, scores = self.search_batch(queries, k=1)
+        matches = []
+        for row_indices, row_scores in zip(indices, scores):
+            if len(row_indices) == 0 or row_indices[0] < 0:
+                matches.append((None, None, 0.0))
+            else:
+                i = row_indices[0]
+                matches.append((self.ids[i], self.names[i], float(row_scores[0])))
+        return matches
@@ -0,0 +1,277 @@
+import os
+import json
+import hashlib
+import logging
+import numpy as np
+
+
+def normalize_rows(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def top_k(scores, k):
+    # Indices and values of the k largest entries per row, best first.
+    k = min(k, scores.shape[1])
+    if k == 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.int64), empty.astype(np.float32)
+    if k < scores.shape[1]:
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        top = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1)
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+
+def vectors_fingerprint(vectors):
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    digest = hashlib.sha1(str(vectors.shape).encode("utf-8"))
+    digest.update(vectors.tobytes())
+    return digest.hexdigest()
+
+
+def kmeans(data, k, iterations=20, seed=0, chunk_size=65536):
+    rng = np.random.default_rng(seed)
+    k = min(k, len(data))
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = assign(data, centroids, chunk_size)
+        counts = np.bincount(assignment, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, data)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        # Re-seed empty clusters from random points so every list stays usable.
+        if empty.any():
+            centroids[empty] = data[rng.choice(len(data), int(empty.sum()), replace=False)]
+    return centroids
+
+
+def assign(data, centroids, chunk_size=65536):
+    centroid_norms = np.einsum("ij,ij->i", centroids, centroids)
+    assignment = np.empty(len(data), dtype=np.int64)
+    for start in range(0, len(data), chunk_size):
+        chunk = data[start:start + chunk_size]
+        distances = centroid_norms - 2.0 * (chunk @ centroids.T)
+        assignment[start:start + chunk_size] = np.argmin(distances, axis=1)
+    return assignment
+
+
+class BruteForceIndex:
+    kind = "brute"
+    exact = True
+
+    def __init__(self):
+        self.vectors = np.empty((0, 0), dtype=np.float32)
+        self.fingerprint = None
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def train(self, vectors):
+        return self
+
+    def add(self, vectors):
+        self.vectors = np.ascontiguousarray(normalize_rows(vectors))
+        self.fingerprint = vectors_fingerprint(vectors)
+        return self
+
+    def search(self, queries, k=1):
+        queries = normalize_rows(queries)
+        if len(self) == 0:
+            return top_k(np.empty((len(queries), 0), dtype=np.float32), k)
+        return top_k(queries @ self.vectors.T, k)
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "vectors.npy"), self.vectors)
+        write_meta(path, {"kind": self.kind, "fingerprint": self.fingerprint})
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        meta = read_meta(path)
+        index = cls()
+        index.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r" if mmap else None)
+        index.fingerprint = meta["fingerprint"]
+        return index
+
+
+class IVFPQIndex:
+    # Inverted file over a coarse k-means quantizer with product-quantized
+    # residuals; scores are inner products estimated from lookup tables.
+    kind = "ivfpq"
+    exact = False
+
+    def __init__(self, nlist=256, m=64, nbits=8, nprobe=16, train_iterations=20, seed=0):
+        if nbits > 8:
+            raise ValueError("IVFPQIndex stores codes as uint8; nbits must be at most 8")
+        self.nlist = nlist
+        self.m = m
+        self.ksub = 2 ** nbits
+        self.nprobe = nprobe
+        self.train_iterations = train_iterations
+        self.seed = seed
+        self.dim = None
+        self.coarse_centroids = None
+        self.codebooks = None
+        self.codes = np.empty((0, m), dtype=np.uint8)
+        self.row_ids = np.empty((0,), dtype=np.int64)
+        self.list_offsets = np.zeros(nlist + 1, dtype=np.int64)
+        self.fingerprint = None
+
+    def __len__(self):
+        return len(self.row_ids)
+
+    @property
+    def is_trained(self):
+        return self.codebooks is not None
+
+    def train(self, vectors, max_training_points=100000):
+        vectors = normalize_rows(vectors)
+        self.dim = vectors.shape[1]
+        if self.dim % self.m != 0:
+            raise ValueError(f"Dimension {self.dim} is not divisible by {self.m} sub-quantizers")
+
+        rng = np.random.default_rng(self.seed)
+        if len(vectors) > max_training_points:
+            vectors = vectors[rng.choice(len(vectors), max_training_points, replace=False)]
+
+        self.coarse_centroids = kmeans(vectors, self.nlist, self.train_iterations, self.seed)
+        self.nlist = len(self.coarse_centroids)
+        residuals = vectors - self.coarse_centroids[assign(vectors, self.coarse_centroids)]
+
+        dsub = self.dim // self.m
+        self.ksub = min(self.ksub, len(vectors))
+        self.codebooks = np.zeros((self.m, self.ksub, dsub), dtype=np.float32)
+        for j in range(self.m):
+            sub = np.ascontiguousarray(residuals[:, j * dsub:(j + 1) * dsub])
+            self.codebooks[j] = kmeans(sub, self.ksub, self.train_iterations, self.seed + j + 1)
+        return self
+
+    def encode(self, residuals):
+        dsub = self.dim // self.m
+        codes = np.empty((len(residuals), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            sub = np.ascontiguousarray(residuals[:, j * dsub:(j + 1) * dsub])
+            codes[:, j] = assign(sub, self.codebooks[j])
+        return codes
+
+    def add(self, vectors):
+        if not self.is_trained:
+            raise RuntimeError("IVFPQIndex must be trained before adding vectors")
+        self.fingerprint = vectors_fingerprint(vectors)
+        vectors = normalize_rows(vectors)
+        lists = assign(vectors, self.coarse_centroids)
+        codes = self.encode(vectors - self.coarse_centroids[lists])
+
+        order = np.argsort(lists, kind="stable")
+        self.codes = np.ascontiguousarray(codes[order])
+        self.row_ids = order.astype(np.int64)
+        counts = np.bincount(lists, minlength=self.nlist)
+        self.list_offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        return self
+
+    def search(self, queries, k=1, nprobe=None):
+        queries = normalize_rows(queries)
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        indices = np.full((len(queries), k), -1, dtype=np.int64)
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        if len(self) == 0:
+            return indices[:, :0], scores[:, :0]
+
+        dsub = self.dim // self.m
+        coarse_scores = queries @ self.coarse_centroids.T
+        probes, _ = top_k(coarse_scores, nprobe)
+        # (queries, m, ksub) inner products between query sub-vectors and codewords.
+        tables = np.einsum("qmd,mkd->qmk", queries.reshape(len(queries), self.m, dsub), self.codebooks)
+        subspaces = np.arange(self.m)
+
+        for qi, query_probes in enumerate(probes):
+            starts = self.list_offsets[query_probes]
+            ends = self.list_offsets[query_probes + 1]
+            lengths = ends - starts
+            if lengths.sum() == 0:
+                continue
+            rows = np.concatenate([np.arange(s, e) for s, e in zip(starts, ends)])
+            base = np.repeat(coarse_scores[qi, query_probes], lengths)
+            candidate_scores = base + tables[qi][subspaces, self.codes[rows]].sum(axis=1)
+            top, top_scores = top_k(candidate_scores[None, :], k)
+            indices[qi, :top.shape[1]] = self.row_ids[rows[top[0]]]
+            scores[qi, :top.shape[1]] = top_scores[0]
+        return indices, scores
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for name in ("coarse_centroids", "codebooks", "codes", "row_ids", "list_offsets"):
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+        write_meta(path, {
+            "kind": self.kind,
+            "fingerprint": self.fingerprint,
+            "nlist": self.nlist,
+            "m": self.m,
+            "ksub": self.ksub,
+            "nprobe": self.nprobe,
+            "dim": self.dim,
+        })
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        meta = read_meta(path)
+        index = cls(nlist=meta["nlist"], m=meta["m"], nprobe=meta["nprobe"])
+        index.ksub = meta["ksub"]
+        index.dim = meta["dim"]
+        index.fingerprint = meta["fingerprint"]
+        mmap_mode = "r" if mmap else None
+        for name in ("coarse_centroids", "codebooks", "codes", "row_ids", "list_offsets"):
+            setattr(index, name, np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode))
+        return index
+
+
+INDEX_BACKENDS = {
+    BruteForceIndex.kind: BruteForceIndex,
+    IVFPQIndex.kind: IVFPQIndex,
+}
+
+
+def write_meta(path, meta):
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+
+def read_meta(path):
+    with open(os.path.join(path, "meta.json")) as f:
+        return json.load(f)
+
+
+def load_index(path, mmap=True):
+    meta = read_meta(path)
+    return INDEX_BACKENDS[meta["kind"]].load(path, mmap=mmap)
+
+
+def load_or_build_index(kind, path, vectors, **kwargs):
+    # Reuse the persisted index when it was built from exactly these vectors,
+    # otherwise train a new one and write it back for the next start-up.
+    fingerprint = vectors_fingerprint(vectors)
+    if os.path.exists(os.path.join(path, "meta.json")):
+        try:
+            meta = read_meta(path)
+            if meta.get("kind") == kind and meta.get("fingerprint") == fingerprint:
+                return load_index(path)
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable face index at {path}: {e}")
+
+    logging.info(f"Building {kind} face index over {len(vectors)} vectors.")
+    index = INDEX_BACKENDS[kind](**kwargs)
+    index.train(vectors)
+    index.add(vectors)
+    try:
+        index.save(path)
+    except OSError as e:
+        logging.warning(f"Failed to persist face index to {path}: {e}")
+    return index
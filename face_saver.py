@@ -2,11 +2,29 @@ import os
 import cv2
 import uuid
 import logging
-import albumentations as A
 from database_utils import DatabaseUtils
 from face_utils import FaceUtils
 
 
+def build_augmentation_pipeline():
+    # Only enrollment augments faces, so albumentations is imported on demand.
+    import albumentations as A
+
+    return A.Compose(
+        [
+            A.HorizontalFlip(p=0.5),
+            A.Rotate(limit=10, p=0.5),
+            A.RandomBrightnessContrast(p=0.5),
+            A.Affine(
+                scale=(0.9, 1.1),
+                translate_percent=(0.0625, 0.0625),
+                rotate=(-10, 10),
+                p=0.5,
+            ),
+        ]
+    )
+
+
 class FaceSaver:
     def __init__(self, face_detector, augmentation_pipeline, recognition_model, db_utils):
         self.face_detector = face_detector
@@ -15,6 +33,16 @@ class FaceSaver:
         self.db_utils = db_utils
         self.face_db = {}
 
+    def get_face_embedding(self, img, landmarks):
+        # Align from the landmarks of the frame-level detection instead of
+        # detecting the face again inside its crop.
+        if landmarks is None or len(landmarks) == 0:
+            return None, False
+        embeddings, success = FaceUtils.get_face_embeddings(
+            self.recognition_model, img, [landmarks[0]]
+        )
+        return (embeddings[:1], True) if success else (None, False)
+
     def save_face(self, name, number, img, face_directory, cap, num_images=10):
         try:
             detections, landmarks = self.face_detector.detect(
@@ -28,9 +56,7 @@ class FaceSaver:
                 y1 = max(0, y1)
                 x2 = min(width, x2)
                 y2 = min(height, y2)
-                face_embedding, success = FaceUtils.get_face_embedding(
-                    self.face_detector, self.recognition_model, face_crop
-                )
+                face_embedding, success = self.get_face_embedding(img, landmarks)
                 if success:
                     self.face_db[name] = face_embedding
                     person_dir = os.path.join(face_directory, name)
@@ -82,9 +108,7 @@ class FaceSaver:
                 y1 = max(0, y1)
                 x2 = min(width, x2)
                 y2 = min(height, y2)
-                face_embedding, success = FaceUtils.get_face_embedding(
-                    self.face_detector, self.recognition_model, face_crop
-                )
+                face_embedding, success = self.get_face_embedding(img, landmarks)
                 if success:
                     self.face_db[name] = face_embedding
                     person_dir = os.path.join(face_directory, name)
@@ -1,11 +1,12 @@
 import cv2
 import numpy as np
 import logging
-from insightface.utils import face_align
 
 class FaceUtils:
     @staticmethod
     def align_face(image, landmarks):
+        from insightface.utils import face_align
+
         return face_align.norm_crop(image, landmark=landmarks)
 
     @staticmethod
@@ -29,3 +30,19 @@ class FaceUtils:
         except Exception as e:
             logging.error(f"Error getting face embedding: {e}")
         return None, False
+
+    @staticmethod
+    def get_face_embeddings(recognition_model, img, landmarks_list):
+        # Aligns every face from landmarks already found in `img` and embeds
+        # them with a single batched recognizer call.
+        if len(landmarks_list) == 0:
+            return np.empty((0, 512), dtype=np.float32), False
+        try:
+            aligned_faces = [FaceUtils.align_face(img, landmarks) for landmarks in landmarks_list]
+            embeddings = np.asarray(recognition_model.get_feat(aligned_faces), dtype=np.float32)
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            return embeddings / norms, True
+        except Exception as e:
+            logging.error(f"Error getting batched face embeddings: {e}")
+        return None, False
@@ -0,0 +1,256 @@
+import time
+import queue
+import logging
+import threading
+
+
+class FaceRecord:
+    __slots__ = (
+        "label", "track_id", "tlwh", "bbox", "crop", "landmarks", "velocity",
+        "decision", "identity", "student_id", "annotation",
+    )
+
+    def __init__(self, label, track_id, tlwh, bbox, crop, landmarks, velocity=None):
+        self.label = label
+        self.track_id = track_id
+        self.tlwh = tlwh
+        self.bbox = bbox
+        self.crop = crop
+        self.landmarks = landmarks
+        self.velocity = velocity
+        self.decision = None
+        self.identity = None
+        self.student_id = None
+        self.annotation = None
+
+
+class FrameContext:
+    # Everything one frame carries from detection through rendering, so that
+    # stages never read tracker state that the next frame may have changed.
+    def __init__(self, frame, original_frame, frame_id=0):
+        self.frame = frame
+        self.original_frame = original_frame
+        self.frame_id = frame_id
+        self.faces = []
+        self.active_track_ids = None
+        self.start_time = time.perf_counter()
+
+
+class DropOldestQueue:
+    def __init__(self, maxsize=1):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self.lock = threading.Lock()
+
+    def put(self, item):
+        # Never blocks the producer: a full queue sheds its oldest item instead.
+        with self.lock:
+            while True:
+                try:
+                    self.queue.put_nowait(item)
+                    return
+                except queue.Full:
+                    try:
+                        self.queue.get_nowait()
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+
+    def get(self, timeout=None):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def qsize(self):
+        return self.queue.qsize()
+
+
+class StageStats:
+    def __init__(self):
+        self.processed = 0
+        self.errors = 0
+        self.total_latency = 0.0
+        self.last_latency = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, latency, failed=False):
+        with self.lock:
+            self.processed += 1
+            self.errors += int(failed)
+            self.total_latency += latency
+            self.last_latency = latency
+
+    def snapshot(self):
+        with self.lock:
+            average = self.total_latency / self.processed if self.processed else 0.0
+            return {
+                "processed": self.processed,
+                "errors": self.errors,
+                "avg_ms": average * 1e3,
+                "last_ms": self.last_latency * 1e3,
+            }
+
+
+class LatestFrameCapture:
+    # Reads the camera on its own thread and keeps only the newest frame, so a
+    # slow consumer never makes cv2.VideoCapture buffer stale frames.
+    def __init__(self, cap, output_queue=None):
+        self.cap = cap
+        self.output_queue = output_queue
+        self.frame = None
+        self.sequence = 0
+        self.read_sequence = 0
+        self.running = False
+        self.condition = threading.Condition()
+        self.stats = StageStats()
+        self.thread = threading.Thread(target=self.run, name="capture", daemon=True)
+
+    def start(self):
+        self.running = True
+        self.thread.start()
+        return self
+
+    def run(self):
+        while self.running:
+            start_time = time.perf_counter()
+            ret, frame = self.cap.read()
+            if not ret:
+                logging.error("Failed to grab frame.")
+                self.stats.record(time.perf_counter() - start_time, failed=True)
+                break
+            with self.condition:
+                self.frame = frame
+                self.sequence += 1
+                self.condition.notify_all()
+            if self.output_queue is not None:
+                self.output_queue.put((self.sequence, frame))
+            self.stats.record(time.perf_counter() - start_time)
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+
+    def read(self, timeout=1.0):
+        # Same contract as cv2.VideoCapture.read, returning a frame newer than
+        # the one handed out by the previous call.
+        with self.condition:
+            self.condition.wait_for(
+                lambda: self.sequence > self.read_sequence or not self.running, timeout=timeout
+            )
+            if self.frame is None or self.sequence == self.read_sequence:
+                return False, None
+            self.read_sequence = self.sequence
+            return True, self.frame.copy()
+
+    def set(self, prop_id, value):
+        return self.cap.set(prop_id, value)
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def release(self):
+        self.running = False
+        if self.thread.is_alive():
+            self.thread.join(timeout=2.0)
+        self.cap.release()
+
+
+class PipelineStage:
+    def __init__(self, name, fn, input_queue, output_queue):
+        self.name = name
+        self.fn = fn
+        self.input_queue = input_queue
+        self.output_queue = output_queue
+        self.stats = StageStats()
+        self.running = False
+        self.thread = threading.Thread(target=self.run, name=name, daemon=True)
+
+    def start(self):
+        self.running = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.thread.is_alive():
+            self.thread.join(timeout=2.0)
+
+    def run(self):
+        while self.running:
+            item = self.input_queue.get(timeout=0.1)
+            if item is None:
+                continue
+            start_time = time.perf_counter()
+            try:
+                result = self.fn(item)
+            except Exception as e:
+                logging.error(f"Error in {self.name} stage: {e}")
+                self.stats.record(time.perf_counter() - start_time, failed=True)
+                continue
+            self.stats.record(time.perf_counter() - start_time)
+            if result is not None:
+                self.output_queue.put(result)
+
+
+class FramePipeline:
+    # capture -> detect+track -> liveness+recognition+attendance -> render,
+    # each on its own thread and joined by bounded drop-oldest queues.
+    def __init__(self, tracker, cap, queue_size=2):
+        self.tracker = tracker
+        self.queues = {
+            "detect": DropOldestQueue(1),
+            "recognize": DropOldestQueue(queue_size),
+            "render": DropOldestQueue(queue_size),
+            "output": DropOldestQueue(queue_size),
+        }
+        self.capture = LatestFrameCapture(cap, self.queues["detect"])
+        self.stages = [
+            PipelineStage("detect", self.detect, self.queues["detect"], self.queues["recognize"]),
+            PipelineStage("recognize", tracker.recognize, self.queues["recognize"], self.queues["render"]),
+            PipelineStage("render", self.render, self.queues["render"], self.queues["output"]),
+        ]
+
+    def detect(self, item):
+        _, frame = item
+        return self.tracker.detect_and_track(frame)
+
+    def render(self, context):
+        self.tracker.render(context)
+        return context
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+        self.capture.start()
+        return self
+
+    def stop(self):
+        self.capture.release()
+        for stage in self.stages:
+            stage.stop()
+
+    @property
+    def running(self):
+        return self.capture.running
+
+    def get(self, timeout=0.1):
+        return self.queues["output"].get(timeout=timeout)
+
+    def stats(self):
+        stats = {"capture": self.capture.stats.snapshot()}
+        for stage in self.stages:
+            stats[stage.name] = stage.stats.snapshot()
+            stats[stage.name]["queue_depth"] = stage.input_queue.qsize()
+            stats[stage.name]["dropped"] = stage.input_queue.dropped
+        stats["output"] = {
+            "queue_depth": self.queues["output"].qsize(),
+            "dropped": self.queues["output"].dropped,
+        }
+        return stats
+
+    def log_stats(self):
+        for name, values in self.stats().items():
+            logging.info(f"Pipeline {name}: " + ", ".join(
+                f"{key}={value:.1f}" if isinstance(value, float) else f"{key}={value}"
+                for key, value in values.items()
+            ))
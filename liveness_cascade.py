@@ -0,0 +1,132 @@
+import time
+import logging
+import threading
+
+
+class CascadeStage:
+    def __init__(self, name, fn, reorder=True):
+        self.name = name
+        self.fn = fn
+        self.reorder = reorder
+        self.calls = 0
+        self.rejections = 0
+        self.skips = 0
+        self.total_time = 0.0
+
+    @property
+    def cost(self):
+        return self.total_time / self.calls if self.calls else 0.0
+
+    @property
+    def rejection_rate(self):
+        return self.rejections / self.calls if self.calls else 0.0
+
+    @property
+    def priority(self):
+        # For independent filters, running them by ascending cost / rejection
+        # rate minimizes the expected time spent per face.
+        return self.cost / max(self.rejection_rate, 1e-3)
+
+
+class LivenessCascade:
+    # Runs liveness gates in order, stopping at the first one that rejects a
+    # face. Stages are re-ordered from their measured cost and rejection rate,
+    # and each track's last verdict is reused for verdict_ttl seconds.
+    def __init__(self, stages, verdict_ttl=0.5, warmup_calls=20, reorder_every=100):
+        self.stages = list(stages)
+        self.extra_stages = {}
+        self.verdict_ttl = verdict_ttl
+        self.warmup_calls = warmup_calls
+        self.reorder_every = reorder_every
+        self.runs = 0
+        self.verdicts = {}
+        self.verdict_hits = 0
+        self.lock = threading.Lock()
+
+    def stage(self, name):
+        # Stages that run outside run(), like the batched model, are tracked here.
+        for stage in self.stages:
+            if stage.name == name:
+                return stage
+        if name not in self.extra_stages:
+            self.extra_stages[name] = CascadeStage(name, None, reorder=False)
+        return self.extra_stages[name]
+
+    def record(self, name, elapsed, rejected=0, calls=1):
+        with self.lock:
+            stage = self.stage(name)
+            stage.calls += calls
+            stage.rejections += rejected
+            stage.total_time += elapsed
+
+    def skip(self, name, count=1):
+        with self.lock:
+            self.stage(name).skips += count
+
+    def reorder(self):
+        # Stages with reorder=False keep their configured position.
+        with self.lock:
+            if any(stage.calls < self.warmup_calls for stage in self.stages if stage.reorder):
+                return
+            movable = sorted((s for s in self.stages if s.reorder), key=lambda s: s.priority)
+            self.stages = [stage if not stage.reorder else movable.pop(0) for stage in self.stages]
+
+    def run(self, *args, skip=()):
+        # Returns the first rejecting stage's result, or None if all pass.
+        with self.lock:
+            self.runs += 1
+            reorder = self.reorder_every and self.runs % self.reorder_every == 0
+        if reorder:
+            self.reorder()
+        for stage in list(self.stages):
+            if stage.name in skip:
+                self.skip(stage.name)
+                continue
+            start_time = time.perf_counter()
+            result = stage.fn(*args)
+            self.record(stage.name, time.perf_counter() - start_time, int(result is not None))
+            if result is not None:
+                return result
+        return None
+
+    def cached_verdict(self, track_id, now=None):
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            cached = self.verdicts.get(track_id)
+            if cached is None or now - cached[1] >= self.verdict_ttl:
+                return None
+            self.verdict_hits += 1
+            return cached[0]
+
+    def store_verdict(self, track_id, verdict, now=None):
+        if verdict[1] == "Error":
+            return
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            self.verdicts[track_id] = (verdict, now)
+
+    def evict(self, active_track_ids):
+        with self.lock:
+            for track_id in [t for t in self.verdicts if t not in active_track_ids]:
+                del self.verdicts[track_id]
+
+    def stats(self):
+        with self.lock:
+            stats = {"verdict_cache": {"hits": self.verdict_hits}}
+            for stage in self.stages + list(self.extra_stages.values()):
+                stats[stage.name] = {
+                    "calls": stage.calls,
+                    "skips": stage.skips,
+                    "reject_rate": stage.rejection_rate,
+                    "avg_ms": stage.cost * 1e3,
+                }
+            return stats
+
+    def log_stats(self):
+        order = " -> ".join(stage.name for stage in self.stages)
+        logging.info(f"Liveness cascade order: {order}")
+        for name, values in self.stats().items():
+            logging.info(f"Liveness {name}: " + ", ".join(
+                f"{key}={value:.2f}" if isinstance(value, float) else f"{key}={value}"
+                for key, value in values.items()
+            ))
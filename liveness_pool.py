@@ -0,0 +1,174 @@
+import queue
+import logging
+import numpy as np
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor, wait
+
+# Largest crop that fits a slot: a full 640x480 BGR frame.
+SLOT_SIZE = 640 * 480 * 3
+
+_worker = {}
+
+
+def _init_worker(model_path, backend="torch", frequency_mode="full"):
+    # Runs once in every worker process: models are loaded here, never pickled.
+    from silentFaceSpoofing import load_anti_spoofing_model
+    from motion_clarity_utils import MotionClarityUtils
+
+    _worker["anti_spoofing_model"] = load_anti_spoofing_model(backend, model_path)
+    _worker["motion_clarity_utils"] = MotionClarityUtils(frequency_mode=frequency_mode)
+    _worker["buffers"] = {}
+
+
+def _run_task(task, name, shape, dtype, keep_attached=True, features=None):
+    # Pool slots stay mapped in the worker between calls; one-off buffers do not.
+    # With `features` set the slot holds the parent's grayscale crop instead of
+    # the colour crop, and `features` carries its other precomputed values.
+    buffers = _worker["buffers"]
+    buffer = buffers.get(name) or shared_memory.SharedMemory(name=name)
+    if keep_attached:
+        buffers[name] = buffer
+    face_crop = None
+    try:
+        face_crop = np.ndarray(shape, dtype=dtype, buffer=buffer.buf)
+        if features is not None:
+            from motion_clarity_utils import CropFeatures
+
+            face_crop = CropFeatures.from_gray(face_crop, **features)
+        if task == "predict":
+            return _worker["anti_spoofing_model"].predict(face_crop)
+        if task == "analyze_texture":
+            return _worker["motion_clarity_utils"].analyze_texture(face_crop)
+        if task == "analyze_frequency":
+            return _worker["motion_clarity_utils"].analyze_frequency(face_crop)
+        raise ValueError(f"Unknown liveness task: {task}")
+    finally:
+        if not keep_attached:
+            face_crop = None
+            buffer.close()
+
+
+def _run_packed(task, name, shapes, dtype):
+    # Several crops packed back to back in one slot, scored with one forward pass.
+    buffers = _worker["buffers"]
+    if name not in buffers:
+        buffers[name] = shared_memory.SharedMemory(name=name)
+    face_crops = []
+    offset = 0
+    for shape in shapes:
+        face_crop = np.ndarray(shape, dtype=dtype, buffer=buffers[name].buf, offset=offset)
+        face_crops.append(face_crop)
+        offset += face_crop.nbytes
+    if task == "predict_batch":
+        return _worker["anti_spoofing_model"].predict_batch(face_crops)
+    raise ValueError(f"Unknown packed liveness task: {task}")
+
+
+class ProcessLivenessPool:
+    # Runs the GIL-bound liveness work (MiniFASNet, texture and FFT checks) in
+    # worker processes. Crops travel through pre-allocated shared-memory slots
+    # so only a slot name and shape are pickled per call.
+    def __init__(self, model_path, max_workers=4, slots=None, backend="torch", frequency_mode="full"):
+        self.executor = ProcessPoolExecutor(
+            max_workers=max_workers, initializer=_init_worker, initargs=(model_path, backend, frequency_mode)
+        )
+        self.buffers = [
+            shared_memory.SharedMemory(create=True, size=SLOT_SIZE)
+            for _ in range(slots or 2 * max_workers)
+        ]
+        self.free_slots = queue.Queue()
+        for slot in range(len(self.buffers)):
+            self.free_slots.put(slot)
+
+    def run(self, task, face_crop, share_features=False):
+        # With share_features, a CropFeatures crop is shipped as its grayscale
+        # plus Laplacian variance, so workers reuse what the parent computed.
+        features = None
+        if share_features and hasattr(face_crop, "gray"):
+            features = {"laplacian_var": face_crop.laplacian_var}
+            face_crop = face_crop.gray
+        face_crop = np.ascontiguousarray(getattr(face_crop, "crop", face_crop))
+        if face_crop.nbytes > SLOT_SIZE:
+            logging.warning(f"Crop of {face_crop.nbytes} bytes exceeds the shared slot size; "
+                            "sending it through a one-off buffer.")
+            return self.run_oversized(task, face_crop, features)
+
+        slot = self.free_slots.get()
+        try:
+            buffer = self.buffers[slot]
+            np.ndarray(face_crop.shape, dtype=face_crop.dtype, buffer=buffer.buf)[...] = face_crop
+            future = self.executor.submit(
+                _run_task, task, buffer.name, face_crop.shape, face_crop.dtype.str, True, features
+            )
+            return future.result()
+        finally:
+            self.free_slots.put(slot)
+
+    def run_oversized(self, task, face_crop, features=None):
+        buffer = shared_memory.SharedMemory(create=True, size=face_crop.nbytes)
+        try:
+            np.ndarray(face_crop.shape, dtype=face_crop.dtype, buffer=buffer.buf)[...] = face_crop
+            return self.executor.submit(
+                _run_task, task, buffer.name, face_crop.shape, face_crop.dtype.str, False, features
+            ).result()
+        finally:
+            buffer.close()
+            buffer.unlink()
+
+    def predict(self, face_crop):
+        return self.run("predict", face_crop)
+
+    def predict_batch(self, face_crops):
+        face_crops = [np.ascontiguousarray(face_crop, dtype=np.uint8) for face_crop in face_crops]
+        chunks, chunk, used = [], [], 0
+        for i, face_crop in enumerate(face_crops):
+            if face_crop.nbytes > SLOT_SIZE:
+                continue
+            if chunk and used + face_crop.nbytes > SLOT_SIZE:
+                chunks.append(chunk)
+                chunk, used = [], 0
+            chunk.append(i)
+            used += face_crop.nbytes
+        if chunk:
+            chunks.append(chunk)
+
+        results = [None] * len(face_crops)
+        pending = []
+        try:
+            for chunk in chunks:
+                slot = self.free_slots.get()
+                buffer = self.buffers[slot]
+                offset = 0
+                for i in chunk:
+                    face_crop = face_crops[i]
+                    np.ndarray(face_crop.shape, dtype=np.uint8, buffer=buffer.buf, offset=offset)[...] = face_crop
+                    offset += face_crop.nbytes
+                future = self.executor.submit(
+                    _run_packed, "predict_batch", buffer.name, [face_crops[i].shape for i in chunk], "|u1"
+                )
+                pending.append((slot, chunk, future))
+            for slot, chunk, future in pending:
+                for i, is_real in zip(chunk, future.result()):
+                    results[i] = is_real
+        finally:
+            wait([future for _, _, future in pending])
+            for slot, _, _ in pending:
+                self.free_slots.put(slot)
+
+        for i, is_real in enumerate(results):
+            if is_real is None:
+                results[i] = self.predict(face_crops[i])
+        return results
+
+    def analyze_texture(self, face_crop):
+        return self.run("analyze_texture", face_crop, share_features=True)
+
+    def analyze_frequency(self, face_crop):
+        return self.run("analyze_frequency", face_crop, share_features=True)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        for buffer in self.buffers:
+            buffer.close()
+            buffer.unlink()
+        self.buffers = []
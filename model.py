@@ -1,7 +1,29 @@
 import torch
 import torch.nn.functional as F
 from torch.nn import Linear, Conv2d, BatchNorm1d, BatchNorm2d, PReLU, ReLU, Sigmoid, \
-    AdaptiveAvgPool2d, Sequential, Module
+    AdaptiveAvgPool2d, Sequential, Module, Identity
+
+
+@torch.no_grad()
+def fuse_conv_bn(conv, bn):
+    # Folds an eval-mode BatchNorm into the convolution that feeds it.
+    fused = Conv2d(conv.in_channels, conv.out_channels, kernel_size=conv.kernel_size, stride=conv.stride,
+                   padding=conv.padding, groups=conv.groups, bias=True).to(conv.weight.device)
+    scale = bn.weight / torch.sqrt(bn.running_var + bn.eps)
+    bias = conv.bias if conv.bias is not None else torch.zeros_like(bn.running_mean)
+    fused.weight.copy_(conv.weight * scale.reshape(-1, 1, 1, 1))
+    fused.bias.copy_((bias - bn.running_mean) * scale + bn.bias)
+    return fused
+
+
+@torch.no_grad()
+def fuse_linear_bn(linear, bn):
+    fused = Linear(linear.in_features, linear.out_features, bias=True).to(linear.weight.device)
+    scale = bn.weight / torch.sqrt(bn.running_var + bn.eps)
+    bias = linear.bias if linear.bias is not None else torch.zeros_like(bn.running_mean)
+    fused.weight.copy_(linear.weight * scale.reshape(-1, 1))
+    fused.bias.copy_((bias - bn.running_mean) * scale + bn.bias)
+    return fused
 
 
 class L2Norm(Module):
@@ -22,6 +44,10 @@ class Conv_block(Module):
         self.bn = BatchNorm2d(out_c)
         self.prelu = PReLU(out_c)
 
+    def fuse(self):
+        self.conv = fuse_conv_bn(self.conv, self.bn)
+        self.bn = Identity()
+
     def forward(self, x):
         x = self.conv(x)
         x = self.bn(x)
@@ -36,6 +62,10 @@ class Linear_block(Module):
                            groups=groups, stride=stride, padding=padding, bias=False)
         self.bn = BatchNorm2d(out_c)
 
+    def fuse(self):
+        self.conv = fuse_conv_bn(self.conv, self.bn)
+        self.bn = Identity()
+
     def forward(self, x):
         x = self.conv(x)
         x = self.bn(x)
@@ -95,6 +125,12 @@ class SEModule(Module):
         self.bn2 = BatchNorm2d(channels)
         self.sigmoid = Sigmoid()
 
+    def fuse(self):
+        self.fc1 = fuse_conv_bn(self.fc1, self.bn1)
+        self.bn1 = Identity()
+        self.fc2 = fuse_conv_bn(self.fc2, self.bn2)
+        self.bn2 = Identity()
+
     def forward(self, x):
         module_input = x
         x = self.avg_pool(x)
@@ -209,6 +245,16 @@ class MiniFASNet(Module):
         self.drop = torch.nn.Dropout(p=drop_p)
         self.prob = Linear(embedding_size, num_classes, bias=False)
 
+    def fuse(self):
+        # Inference only: folds every BatchNorm into the preceding conv/linear.
+        for module in list(self.modules()):
+            if module is not self and hasattr(module, "fuse"):
+                module.fuse()
+        if self.embedding_size != 512:
+            self.linear = fuse_linear_bn(self.linear, self.bn)
+            self.bn = Identity()
+        return self
+
     def forward(self, x):
         out = self.conv1(x)
         out = self.conv2_dw(out)
@@ -2,50 +2,174 @@ import cv2
 import numpy as np
 import collections
 import logging
+import threading
+
+FREQUENCY_MODES = ("full", "rfft")
+MOTION_MODES = ("full", "roi")
+
+
+class CropFeatures:
+    # Grayscale, resized/blurred grayscale and Laplacian variance of one face
+    # crop, each computed once (in float32) the first time a check asks for it.
+    __slots__ = ("crop", "_gray", "_laplacian_var", "_resized")
+
+    def __init__(self, crop):
+        self.crop = crop
+        self._gray = None
+        self._laplacian_var = None
+        self._resized = {}
+
+    @classmethod
+    def of(cls, face_crop):
+        return face_crop if isinstance(face_crop, cls) else cls(face_crop)
+
+    @classmethod
+    def from_gray(cls, gray, laplacian_var=None):
+        # Features rebuilt without the colour crop, as liveness worker
+        # processes receive them; only gray-based features are available.
+        features = cls(None)
+        features._gray = gray
+        features._laplacian_var = laplacian_var
+        return features
+
+    @property
+    def gray(self):
+        if self._gray is None:
+            self._gray = cv2.cvtColor(self.crop, cv2.COLOR_BGR2GRAY)
+        return self._gray
+
+    @property
+    def laplacian_var(self):
+        if self._laplacian_var is None:
+            _, std = cv2.meanStdDev(cv2.Laplacian(self.gray, cv2.CV_32F))
+            self._laplacian_var = float(std[0, 0]) ** 2
+        return self._laplacian_var
+
+    def resized_gray(self, size, shrink_first=False):
+        key = ("gray", size, shrink_first)
+        if key not in self._resized:
+            if not shrink_first:
+                self._resized[key] = cv2.resize(self.gray, size)
+            else:
+                h, w = self.crop.shape[:2]
+                interpolation = cv2.INTER_AREA if h > size[1] or w > size[0] else cv2.INTER_LINEAR
+                if self._gray is not None:
+                    self._resized[key] = cv2.resize(self._gray, size, interpolation=interpolation)
+                else:
+                    # Shrinking first keeps the colour conversion to a few pixels.
+                    small = cv2.resize(self.crop, size, interpolation=interpolation)
+                    self._resized[key] = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return self._resized[key]
+
+    def blurred(self, size, shrink_first=False):
+        key = ("blurred", size, shrink_first)
+        if key not in self._resized:
+            self._resized[key] = cv2.GaussianBlur(self.resized_gray(size, shrink_first), (5, 5), 0)
+        return self._resized[key]
+
+
+class LivenessState:
+    # Motion/clarity history of one tracked face. The previous ROI is kept
+    # already blurred at frame_size, the only form check_motion reads it in.
+    __slots__ = (
+        "previous_frame", "motion_scores", "frame_clarity_scores",
+        "motion_threshold", "clarity_threshold", "high_motion_count", "low_clarity_count",
+        "pixel_motion", "velocity_skips",
+    )
+
+    def __init__(self, motion_threshold, clarity_threshold, history=5):
+        self.previous_frame = None
+        self.motion_scores = collections.deque(maxlen=history)
+        self.frame_clarity_scores = collections.deque(maxlen=history)
+        self.motion_threshold = motion_threshold
+        self.clarity_threshold = clarity_threshold
+        self.high_motion_count = 0
+        self.low_clarity_count = 0
+        # Whether the last differenced frame showed motion, and how many frames
+        # tracker velocity has answered since.
+        self.pixel_motion = False
+        self.velocity_skips = 0
 
 
 class MotionClarityUtils:
     def __init__(
-        self, frame_size=(300, 300), motion_threshold=5.0, clarity_threshold=30
+        self, frame_size=None, motion_threshold=5.0, clarity_threshold=30,
+        frequency_mode="full", frequency_patch_size=64, motion_mode="full", velocity_motion_threshold=1.5,
+        max_velocity_skips=2,
     ):
-        self.frame_size = frame_size
-        self.previous_frame = None
-        self.frame_buffer = collections.deque(maxlen=5)
-        self.motion_scores = collections.deque(maxlen=5)
-        self.frame_clarity_scores = collections.deque(maxlen=5)
-        self.motion_threshold = motion_threshold
+        if frequency_mode not in FREQUENCY_MODES:
+            raise ValueError(f"Unknown frequency mode: {frequency_mode}")
+        if motion_mode not in MOTION_MODES:
+            raise ValueError(f"Unknown motion mode: {motion_mode}")
+        # "full" differences a 300x300 grayscale crop, the scale motion_threshold
+        # is calibrated for; "roi" differences a 64x64 ROI shrunk before the
+        # colour conversion and lets tracker velocity stand in for it.
+        self.motion_mode = motion_mode
+        self.frame_size = frame_size or ((64, 64) if motion_mode == "roi" else (300, 300))
+        # The same head movement gives a blurred 64x64 ROI about 0.7x the mean
+        # difference of the 300x300 crop (2px/3 degree moves of faces/*/*.jpg),
+        # while sensor noise drops to about 0.3x; every motion threshold and
+        # bound is scaled by it.
+        self.motion_scale = 0.7 if motion_mode == "roi" else 1.0
+        self.motion_threshold = motion_threshold * self.motion_scale
         self.clarity_threshold = clarity_threshold
         self.motion_tolerance = 50.0
         self.motion_weight = 0.5
-        self.high_motion_count = 0
-        self.low_clarity_count = 0
         self.min_clarity_to_skip_blur = 20
+        # Kalman speed (pixels/frame at tracker resolution, plus box height
+        # change) above which "roi" mode skips the pixel difference, for at
+        # most max_velocity_skips frames after a differenced frame with motion.
+        self.velocity_motion_threshold = velocity_motion_threshold
+        self.max_velocity_skips = max_velocity_skips
+        # Keyed by BYTETracker track_id; None holds the state of callers that
+        # do not pass a track.
+        self.states = {}
+        # "full" is the native-resolution log-spectrum mean; "rfft" resizes to a
+        # power-of-two patch and compares high/low radial energy, so its cost
+        # does not depend on the crop size.
+        self.frequency_mode = frequency_mode
+        self.frequency_patch_size = frequency_patch_size
+        self.frequency_cutoff = 0.25  # cycles/pixel between "low" and "high" bands
+        self.frequency_threshold = 100.0  # "full": mean of the log spectrum
+        # "rfft": high/low energy ratio. Experimental: not yet calibrated
+        # against spoof crops; see `benchmarks.py frequency-calibration`.
+        self.frequency_ratio_threshold = 0.02
+        self.frequency_buffers = threading.local()
+
+    def state(self, track_id=None):
+        state = self.states.get(track_id)
+        if state is None:
+            state = self.states[track_id] = LivenessState(self.motion_threshold, self.clarity_threshold)
+        return state
 
-    def update_thresholds(self):
-        if self.motion_scores:
-            avg_motion = np.mean(self.motion_scores)
-            self.motion_threshold = max(3.0, min(7.0, avg_motion * 1.2))
+    def evict(self, active_track_ids):
+        for track_id in [t for t in self.states if t is not None and t not in active_track_ids]:
+            del self.states[track_id]
 
-        if self.clarity_threshold:
-            avg_clarity = np.mean(self.clarity_threshold)
-            self.clarity_threshold = max(30.0, min(70.0, avg_clarity * 0.8))
+    def update_thresholds(self, state):
+        if state.motion_scores:
+            avg_motion = np.mean(state.motion_scores)
+            state.motion_threshold = max(3.0 * self.motion_scale, min(7.0 * self.motion_scale, avg_motion * 1.2))
 
-    def measure_clarity(self, image):
+        if state.clarity_threshold:
+            avg_clarity = np.mean(state.clarity_threshold)
+            state.clarity_threshold = max(30.0, min(70.0, avg_clarity * 0.8))
+
+    def measure_clarity(self, image, track_id=None):
         try:
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
-            laplacian_var = min(laplacian_var, 150.0)
+            state = self.state(track_id)
+            laplacian_var = min(CropFeatures.of(image).laplacian_var, 150.0)
 
-            self.frame_clarity_scores.append(laplacian_var)
+            state.frame_clarity_scores.append(laplacian_var)
 
-            smoothed_clarity = np.median(self.frame_clarity_scores)
-            self.update_thresholds()
+            smoothed_clarity = np.median(state.frame_clarity_scores)
+            self.update_thresholds(state)
 
-            avg_motion = np.mean(self.motion_scores) if self.motion_scores else 0.0
+            avg_motion = np.mean(state.motion_scores) if state.motion_scores else 0.0
             adjusted_clarity_threshold = (
-                self.clarity_threshold * 0.8
-                if avg_motion > self.motion_threshold * 0.5
-                else self.clarity_threshold
+                state.clarity_threshold * 0.8
+                if avg_motion > state.motion_threshold * 0.5
+                else state.clarity_threshold
             )
 
             if smoothed_clarity < adjusted_clarity_threshold:
@@ -57,9 +181,9 @@ class MotionClarityUtils:
             logging.error(f"Error measuring clarity: {e}")
             return False, 0.0
 
-    def smooth_motion_scores(self, alpha=0.2):
+    def smooth_motion_scores(self, state, alpha=0.2):
         smoothed_scores = []
-        for i, score in enumerate(self.motion_scores):
+        for i, score in enumerate(state.motion_scores):
             if i == 0:
                 smoothed_scores.append(score)
             else:
@@ -68,60 +192,83 @@ class MotionClarityUtils:
                 )
         return smoothed_scores[-1]
 
-    def check_motion(self, frame, bbox=None):
+    def track_speed(self, velocity):
+        vx, vy, _, vh = velocity
+        return float(np.hypot(vx, vy) + abs(vh))
+
+    def check_motion(self, frame, bbox=None, track_id=None, features=None, velocity=None):
+        # features: the CropFeatures of frame[bbox], when the caller has them.
+        # velocity: the track's Kalman velocity (STrack.mean[4:]). In "roi" mode
+        # a fast track skips the pixel difference, but only right after a
+        # differenced frame that showed motion and for a few frames at a time:
+        # a photo moved in front of the camera has a fast box but a still face,
+        # so it never gets past the difference.
+        state = self.state(track_id)
+        if (
+            self.motion_mode == "roi"
+            and velocity is not None
+            and state.pixel_motion
+            and state.velocity_skips < self.max_velocity_skips
+            and self.track_speed(velocity) > self.velocity_motion_threshold
+        ):
+            state.velocity_skips += 1
+            state.high_motion_count = 0
+            return True
+        state.velocity_skips = 0
         try:
-            if bbox:
-                x1, y1, x2, y2 = map(int, bbox)
-                frame_resized = cv2.resize(frame[y1:y2, x1:x2], self.frame_size)
-            else:
-                frame_resized = cv2.resize(frame, self.frame_size)
+            if features is None:
+                if bbox:
+                    x1, y1, x2, y2 = map(int, bbox)
+                    features = CropFeatures(frame[y1:y2, x1:x2])
+                else:
+                    features = CropFeatures(frame)
+            curr_gray = features.blurred(self.frame_size, shrink_first=self.motion_mode == "roi")
 
-            if self.previous_frame is None:
-                self.previous_frame = frame_resized
-                self.motion_scores.append(0.0)
+            if state.previous_frame is None:
+                state.previous_frame = curr_gray
+                state.motion_scores.append(0.0)
+                state.pixel_motion = False
                 return True
 
-            prev_gray = cv2.cvtColor(self.previous_frame, cv2.COLOR_BGR2GRAY)
-            curr_gray = cv2.cvtColor(frame_resized, cv2.COLOR_BGR2GRAY)
-            prev_gray = cv2.GaussianBlur(prev_gray, (5, 5), 0)
-            curr_gray = cv2.GaussianBlur(curr_gray, (5, 5), 0)
+            prev_gray = state.previous_frame
+            state.previous_frame = curr_gray
             diff = cv2.absdiff(prev_gray, curr_gray)
             motion_score = np.mean(diff)
-            self.previous_frame = frame_resized
 
             # Append motion score and update thresholds
-            self.motion_scores.append(motion_score)
-            self.update_thresholds()
+            state.motion_scores.append(motion_score)
+            self.update_thresholds(state)
 
-            avg_motion = self.smooth_motion_scores()
-            smoothed_motion_score = np.mean(self.motion_scores)
+            avg_motion = self.smooth_motion_scores(state)
+            smoothed_motion_score = np.mean(state.motion_scores)
 
             # Adjusted threshold with more tolerance
-            adjusted_threshold = max(self.motion_threshold * 0.7, 2.0)
+            adjusted_threshold = max(state.motion_threshold * 0.7, 2.0 * self.motion_scale)
+            state.pixel_motion = motion_score >= adjusted_threshold
 
             if smoothed_motion_score < adjusted_threshold:
-                self.high_motion_count += 1
+                state.high_motion_count += 1
                 if (
-                    self.high_motion_count >= 3
+                    state.high_motion_count >= 3
                 ):  # Require 3 consecutive low-motion frames
                     logging.info("Low motion detected; likely static image.")
                     return False
             else:
-                self.high_motion_count = 0
+                state.high_motion_count = 0
 
             return True
         except Exception as e:
             logging.error(f"Error in motion detection: {e}")
-            self.previous_frame = None
+            state.previous_frame = None
             return True
 
-    def check_clarity(self, face_crop):
+    def check_clarity(self, face_crop, track_id=None):
         try:
-            clarity_valid, clarity_score = self.measure_clarity(face_crop)
+            clarity_valid, clarity_score = self.measure_clarity(face_crop, track_id)
             if not clarity_valid:
                 if clarity_score > self.min_clarity_to_skip_blur:
                     logging.info(
-                        f"Clarity Score: {clarity_score:.2f}, Threshold: {self.clarity_threshold:.2f}"
+                        f"Clarity Score: {clarity_score:.2f}, Threshold: {self.state(track_id).clarity_threshold:.2f}"
                     )
                     logging.info("Skipping blurred frame during motion.")
                     return False, None
@@ -134,8 +281,7 @@ class MotionClarityUtils:
 
     def analyze_texture(self, face_crop):
         try:
-            gray = cv2.cvtColor(face_crop, cv2.COLOR_BGR2GRAY)
-            laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()  # Measure texture
+            laplacian_var = CropFeatures.of(face_crop).laplacian_var  # Measure texture
 
             texture_threshold_min = 50.0
             texture_threshold_max = 1000.0
@@ -153,19 +299,74 @@ class MotionClarityUtils:
             return False
 
     def analyze_frequency(self, face_crop):
-        gray = cv2.cvtColor(face_crop, cv2.COLOR_BGR2GRAY)
+        if self.frequency_mode == "rfft":
+            return self.analyze_frequency_rfft(face_crop)
+        mean_frequency = self.mean_frequency(face_crop)
+        logging.info(f"Mean Frequency: {mean_frequency:.2f}")
+        if mean_frequency < self.frequency_threshold:
+            logging.info("Low frequency detected: Likely a photo.")
+            return False
+        return True
+
+    def mean_frequency(self, face_crop):
+        gray = CropFeatures.of(face_crop).gray
         f_transform = np.fft.fft2(gray)
         f_shift = np.fft.fftshift(f_transform)
-        magnitude_spectrum = 20 * np.log(np.abs(f_shift))
-        
-        mean_frequency = np.mean(magnitude_spectrum)
-        logging.info(f"Mean Frequency: {mean_frequency:.2f}")
-        frequency_threshold = 100.0
-        if mean_frequency < frequency_threshold:
+        magnitude_spectrum = 20 * np.log(np.maximum(np.abs(f_shift), 1e-8))
+        return np.mean(magnitude_spectrum)
+
+    def frequency_patch(self, size):
+        # Per-thread buffers, since stateless checks run on several workers at once.
+        patches = getattr(self.frequency_buffers, "patches", None)
+        if patches is None:
+            patches = self.frequency_buffers.patches = {}
+        if size not in patches:
+            fy = np.fft.fftfreq(size)[:, None]
+            fx = np.fft.rfftfreq(size)[None, :]
+            radius = np.sqrt(fx ** 2 + fy ** 2)
+            # Radial bins of width 1/size; bin 0 is the DC term and is ignored.
+            bins = np.minimum(np.rint(radius * size).astype(np.intp), size // 2).ravel()
+            # Inner rfft columns stand for two mirrored coefficients of the full FFT.
+            column_weights = np.full((1, size // 2 + 1), 2.0)
+            column_weights[0, 0] = column_weights[0, -1] = 1.0
+            patches[size] = {
+                "gray": np.empty((size, size), dtype=np.uint8),
+                "patch": np.empty((size, size), dtype=np.float32),
+                "power": np.empty((size, size // 2 + 1), dtype=np.float64),
+                "bins": bins,
+                "column_weights": column_weights,
+                "cutoff_bin": int(round(self.frequency_cutoff * size)),
+            }
+        return patches[size]
+
+    def analyze_frequency_rfft(self, face_crop):
+        ratio = self.frequency_ratio(face_crop)
+        logging.info(f"High/Low Frequency Ratio: {ratio:.4f}")
+        if ratio < self.frequency_ratio_threshold:
             logging.info("Low frequency detected: Likely a photo.")
             return False
         return True
 
+    def frequency_ratio(self, face_crop):
+        size = self.frequency_patch_size
+        buffers = self.frequency_patch(size)
+        gray = CropFeatures.of(face_crop).gray
+        h, w = gray.shape[:2]
+        interpolation = cv2.INTER_AREA if h > size or w > size else cv2.INTER_LINEAR
+        cv2.resize(gray, (size, size), dst=buffers["gray"], interpolation=interpolation)
+        patch = buffers["patch"]
+        np.copyto(patch, buffers["gray"])
+        patch -= patch.mean()
+
+        spectrum = np.fft.rfft2(patch)
+        power = np.abs(spectrum, out=buffers["power"])
+        power *= power
+        power *= buffers["column_weights"]
+        radial = np.bincount(buffers["bins"], weights=power.ravel(), minlength=size // 2 + 1)
+        cutoff = buffers["cutoff_bin"]
+        low, high = radial[1:cutoff].sum(), radial[cutoff:].sum()
+        return high / low if low > 0 else 0.0
+
     def detect_head_movement(self, previous_landmarks, current_landmarks):
         movement_threshold = 10
         movement = np.linalg.norm(
@@ -0,0 +1,100 @@
+import os
+import sys
+import glob
+import logging
+import argparse
+import cv2
+import numpy as np
+from silentFaceSpoofing import MODEL_FILES, OnnxAntiSpoofing, SilentFaceAntiSpoofing, preprocess_batch
+from export_anti_spoofing import export_onnx
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+
+
+def load_calibration_crops(face_directory, limit=200):
+    # Enrolled face crops saved by FaceSaver, one sub-directory per student.
+    paths = sorted(glob.glob(os.path.join(face_directory, "*", "*.jpg")))[:limit]
+    crops = [cv2.imread(path) for path in paths]
+    return [crop for crop in crops if crop is not None]
+
+
+class CalibrationReader:
+    # onnxruntime CalibrationDataReader over preprocessed face crops.
+    def __init__(self, input_name, face_crops, batch_size=8):
+        self.batches = iter([
+            {input_name: preprocess_batch(face_crops[i:i + batch_size])}
+            for i in range(0, len(face_crops), batch_size)
+        ])
+
+    def get_next(self):
+        return next(self.batches, None)
+
+
+def quantize_onnx(onnx_path, output_path, mode, face_crops):
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_dynamic, quantize_static
+
+    if mode == "dynamic":
+        quantize_dynamic(onnx_path, output_path, weight_type=QuantType.QInt8)
+    elif mode == "static":
+        if not face_crops:
+            raise ValueError("Static quantization needs at least one calibration crop.")
+        input_name = OnnxAntiSpoofing(onnx_path).input_name
+        quantize_static(
+            onnx_path,
+            output_path,
+            CalibrationReader(input_name, face_crops),
+            quant_format=QuantFormat.QDQ,
+            per_channel=True,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+        )
+    else:
+        raise ValueError(f"Unknown quantization mode: {mode}")
+    logging.info(f"Quantized {onnx_path} to {output_path} ({mode})")
+
+
+def decision_agreement(reference, candidate, face_crops):
+    expected = reference.predict_scores(face_crops) > reference.threshold
+    actual = candidate.predict_scores(face_crops) > candidate.threshold
+    return float(np.mean(expected == actual)) if len(face_crops) else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Fold BatchNorm into MiniFASNet convolutions and optionally quantize it to int8"
+    )
+    parser.add_argument("--weights", default=MODEL_FILES["torch"])
+    parser.add_argument("--onnx", default=MODEL_FILES["onnx"], help="Fused float ONNX model to write")
+    parser.add_argument("--output", default=MODEL_FILES["onnx-int8"], help="Quantized ONNX model to write")
+    parser.add_argument("--quantize", choices=["none", "dynamic", "static"], default="static")
+    parser.add_argument("--faces", default="faces", help="Directory of enrolled face crops for calibration")
+    parser.add_argument("--calibration-size", type=int, default=200)
+    parser.add_argument("--min-agreement", type=float, default=0.98,
+                        help="Required share of real/fake decisions matching the float model")
+    args = parser.parse_args()
+
+    face_crops = load_calibration_crops(args.faces, args.calibration_size)
+    logging.info(f"Loaded {len(face_crops)} face crops from {args.faces}")
+
+    reference = SilentFaceAntiSpoofing(args.weights, fuse_bn=False)
+    fused = SilentFaceAntiSpoofing(args.weights, fuse_bn=True)
+    checks = [("fused", fused, decision_agreement(reference, fused, face_crops))]
+
+    # The exporter loads the weights with BatchNorm already folded.
+    export_onnx(args.weights, args.onnx)
+    if args.quantize != "none":
+        quantize_onnx(args.onnx, args.output, args.quantize, face_crops)
+        quantized = OnnxAntiSpoofing(args.output)
+        checks.append((f"int8 {args.quantize}", quantized, decision_agreement(reference, quantized, face_crops)))
+
+    failed = False
+    for name, _, agreement in checks:
+        logging.info(f"{name}: {agreement:.1%} decision agreement with the float model")
+        failed = failed or agreement < args.min_agreement
+    if failed:
+        logging.error(f"Decision agreement fell below {args.min_agreement:.1%}.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+import json
+import time
+import logging
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import cv2
+from silentFaceSpoofing import MODEL_FILES
+from face_gallery import FaceGallery
+from face_index import INDEX_BACKENDS
+from face_engine import FaceEngine, ModelRegistry, RecognitionArgs, run_attendance_session, run_enrollment_session
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+
+
+class CameraJob:
+    def __init__(self, kind, target, **params):
+        self.kind = kind
+        self.params = params
+        self.stop_event = threading.Event()
+        self.error = None
+        self.started_at = time.time()
+        self.thread = threading.Thread(target=self.run, args=(target,), name=f"{kind}-job", daemon=True)
+
+    def run(self, target):
+        try:
+            target(self.stop_event, **self.params)
+        except Exception as e:
+            logging.error(f"{self.kind} job failed: {e}")
+            self.error = str(e)
+
+    @property
+    def running(self):
+        return self.thread.is_alive()
+
+    def describe(self):
+        return {
+            "kind": self.kind,
+            "params": self.params,
+            "running": self.running,
+            "error": self.error,
+            "seconds": round(time.time() - self.started_at, 1),
+        }
+
+
+class RecognitionService:
+    # Keeps one ModelRegistry, and with it SCRFD, ArcFace, MiniFASNet and the
+    # database pool, loaded for the lifetime of the process. Attendance
+    # sessions and enrollments then only pay for opening the camera.
+    def __init__(self, recognition_args=None, camera_index=0):
+        self.camera_index = camera_index
+        start_time = time.perf_counter()
+        self.models = ModelRegistry(recognition_args)
+        self.engine = FaceEngine(self.models)
+        # Enrollment recognizes existing students too; its own engine keeps
+        # them from being logged against the last session's subject. Only one
+        # camera job runs at a time, so both engines share the liveness
+        # checks and, in "process" mode, their worker processes.
+        self.enrollment_engine = FaceEngine(
+            self.models, attendance=False, anti_spoofing=self.engine.anti_spoofing
+        )
+        self.load_time = time.perf_counter() - start_time
+        logging.info(f"Models loaded in {self.load_time:.1f}s")
+        self.job = None
+        self.lock = threading.Lock()
+
+    def submit(self, kind, target, **params):
+        # The camera is shared, so only one session or enrollment runs at a time.
+        with self.lock:
+            if self.job is not None and self.job.running:
+                return False, self.job.describe()
+            self.job = CameraJob(kind, target, **params)
+            self.job.thread.start()
+            return True, self.job.describe()
+
+    def start_session(self, subject_id):
+        return self.submit("session", self.run_session, subject_id=subject_id)
+
+    def enroll(self, name, enrollment_number, faculty):
+        return self.submit(
+            "enrollment", self.run_enrollment, name=name, enrollment_number=enrollment_number, faculty=faculty
+        )
+
+    def stop(self):
+        with self.lock:
+            job = self.job
+        if job is None or not job.running:
+            return False
+        job.stop_event.set()
+        job.thread.join(timeout=10.0)
+        return True
+
+    def status(self):
+        with self.lock:
+            job = self.job.describe() if self.job is not None else None
+        return {"load_seconds": round(self.load_time, 2), "job": job}
+
+    def open_camera(self):
+        cap = cv2.VideoCapture(self.camera_index)
+        if not cap.isOpened():
+            raise RuntimeError("Could not open webcam.")
+        return cap
+
+    def run_session(self, stop_event, subject_id):
+        start_time = time.perf_counter()
+        self.engine.load_subject(subject_id)
+        logging.info(f"Session for subject {subject_id} ready in {time.perf_counter() - start_time:.2f}s")
+        run_attendance_session(self.engine, self.open_camera(), stop_event=stop_event, display=False)
+
+    def run_enrollment(self, stop_event, name, enrollment_number, faculty):
+        run_enrollment_session(
+            self.enrollment_engine, self.open_camera(), name, enrollment_number, faculty,
+            stop_event=stop_event, display=False,
+        )
+
+    def close(self):
+        self.stop()
+        self.enrollment_engine.close()
+        self.engine.close()
+        self.models.close()
+
+
+class ControlHandler(BaseHTTPRequestHandler):
+    # Local JSON control API:
+    #   GET  /status
+    #   POST /sessions       {"subject_id": 1}
+    #   POST /sessions/stop
+    #   POST /enrollments    {"name": ..., "enrollment_number": ..., "faculty": ...}
+    service = None
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        if self.path == "/status":
+            self.send_json(200, self.service.status())
+        else:
+            self.send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        try:
+            payload = self.read_json()
+            if self.path == "/sessions":
+                accepted, job = self.service.start_session(int(payload["subject_id"]))
+            elif self.path == "/enrollments":
+                accepted, job = self.service.enroll(
+                    payload["name"], payload["enrollment_number"], payload["faculty"]
+                )
+            elif self.path == "/sessions/stop":
+                self.send_json(200, {"stopped": self.service.stop()})
+                return
+            else:
+                self.send_json(404, {"error": f"Unknown path {self.path}"})
+                return
+        except (KeyError, ValueError) as e:
+            self.send_json(400, {"error": f"Bad request: {e}"})
+            return
+        # 202: the job runs in the background; 409: the camera is busy.
+        self.send_json(202 if accepted else 409, {"accepted": accepted, "job": job})
+
+    def log_message(self, format, *args):
+        logging.info(f"Control API: {format % args}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resident face recognition service")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--camera", type=int, default=0)
+    parser.add_argument("--execution-mode", choices=["thread", "process"], default="thread",
+                        help="Run liveness checks in worker threads or worker processes")
+    parser.add_argument("--anti-spoofing-backend", choices=list(MODEL_FILES), default="torch",
+                        help="Run MiniFASNet through torch, the exported ONNX model or its int8 variant")
+    parser.add_argument("--frequency-mode", choices=["full", "rfft"], default="full",
+                        help="Frequency liveness check on the full crop or on a fixed-size real FFT patch "
+                             "(rfft is experimental: its threshold is not yet calibrated against spoofs)")
+    parser.add_argument("--motion-mode", choices=["full", "roi"], default="full",
+                        help="Motion liveness check on a 300x300 crop or on a 64x64 ROI helped by tracker velocity")
+    parser.add_argument("--gallery-mode", choices=FaceGallery.SCORING_MODES, default="max",
+                        help="Score each student by their best template, the template mean or the top-k mean")
+    parser.add_argument("--index-backend", choices=list(INDEX_BACKENDS), default="brute",
+                        help="Search the whole gallery or shortlist candidates from a persisted IVF-PQ index")
+    args = parser.parse_args()
+
+    recognition_args = RecognitionArgs()
+    recognition_args.execution_mode = args.execution_mode
+    recognition_args.anti_spoofing_backend = args.anti_spoofing_backend
+    recognition_args.frequency_mode = args.frequency_mode
+    recognition_args.motion_mode = args.motion_mode
+    recognition_args.gallery_mode = args.gallery_mode
+    recognition_args.index_backend = args.index_backend
+
+    ControlHandler.service = RecognitionService(recognition_args, args.camera)
+    server = ThreadingHTTPServer((args.host, args.port), ControlHandler)
+    logging.info(f"Recognition service listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        ControlHandler.service.close()
+
+
+if __name__ == "__main__":
+    main()
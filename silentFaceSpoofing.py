@@ -1,17 +1,70 @@
-import torch
+import cv2
 import logging
-from torchvision import transforms
-from model import MiniFASNetV2  # Assuming the model class is defined in model.py
+import numpy as np
+
+INPUT_SIZE = (80, 80)
+
+MODEL_FILES = {
+    "torch": "weights/2.7_80x80_MiniFASNetV2.pth",
+    "onnx": "weights/2.7_80x80_MiniFASNetV2.onnx",
+    "onnx-int8": "weights/2.7_80x80_MiniFASNetV2.int8.onnx",
+}
+
+
+def resize_crops(face_crops, size=INPUT_SIZE):
+    # Stack every crop into one (N, H, W, 3) uint8 array at the model input size.
+    batch = np.empty((len(face_crops), size[1], size[0], 3), dtype=np.uint8)
+    for i, face_crop in enumerate(face_crops):
+        h, w = face_crop.shape[:2]
+        interpolation = cv2.INTER_AREA if h > size[1] or w > size[0] else cv2.INTER_LINEAR
+        batch[i] = cv2.resize(face_crop, size, interpolation=interpolation)
+    return batch
+
+
+def preprocess_batch(face_crops):
+    # Same scaling as ToTensor + Normalize(0.5, 0.5), without the PIL round-trip.
+    batch = resize_crops(face_crops).astype(np.float32)
+    return np.ascontiguousarray(batch.transpose(0, 3, 1, 2) * (1.0 / 127.5) - 1.0)
+
+
+class AntiSpoofingModel:
+    # Backends only implement predict_scores(face_crops) -> (N,) scores.
+    threshold = 0.5  # Adjust threshold as needed
+
+    def predict_scores(self, face_crops):
+        raise NotImplementedError
+
+    def predict_batch(self, face_crops):
+        try:
+            return [bool(score > self.threshold) for score in self.predict_scores(face_crops)]
+        except Exception as e:
+            logging.error(f"Error in batched anti-spoofing prediction: {e}")
+            return [False] * len(face_crops)
+
+    def predict(self, face_crop):
+        try:
+            return bool(self.predict_scores([face_crop])[0] > self.threshold)
+        except Exception as e:
+            logging.error(f"Error in anti-spoofing prediction: {e}")
+            return False
+
+
+class SilentFaceAntiSpoofing(AntiSpoofingModel):
+    def __init__(self, model_path, fuse_bn=True):
+        import torch
 
-class SilentFaceAntiSpoofing:
-    def __init__(self, model_path):
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
         self.model = self.load_model(model_path)
+        if fuse_bn:
+            self.model.fuse()
 
     def load_model(self, model_path):
+        import torch
+        from model import MiniFASNetV2  # Assuming the model class is defined in model.py
+
         # Load the MiniFASNetV2 model
         state_dict = torch.load(model_path, map_location=self.device, weights_only=True)
-        
+
         # Remove 'module.' prefix if present
         new_state_dict = {}
         for k, v in state_dict.items():
@@ -19,33 +72,59 @@ class SilentFaceAntiSpoofing:
                 new_state_dict[k[7:]] = v
             else:
                 new_state_dict[k] = v
-        
+
         model = MiniFASNetV2(conv6_kernel=(5, 5)).to(self.device)  # Initialize the model architecture with the correct kernel size
         model.load_state_dict(new_state_dict)
         model.eval()
         return model
 
     def preprocess(self, face_crop):
-        # Preprocess the face_crop for the model
-        transform = transforms.Compose(
-            [
-                transforms.ToPILImage(),
-                transforms.Resize((80, 80)),  # Update to the correct input size
-                transforms.ToTensor(),
-                transforms.Normalize(mean=[0.5], std=[0.5]),
-            ]
+        return self.preprocess_batch([face_crop])
+
+    def preprocess_batch(self, face_crops):
+        import torch
+
+        return torch.from_numpy(preprocess_batch(face_crops)).to(self.device)
+
+    def predict_scores(self, face_crops):
+        import torch
+
+        if len(face_crops) == 0:
+            return np.empty((0,), dtype=np.float32)
+        input_tensor = self.preprocess_batch(face_crops)
+        with torch.no_grad():
+            output = self.model(input_tensor)
+            # Take the highest class probability per face
+            return torch.sigmoid(output).max(dim=1).values.cpu().numpy()
+
+
+class OnnxAntiSpoofing(AntiSpoofingModel):
+    # MiniFASNetV2 exported by export_anti_spoofing.py (or its int8 variant from
+    # optimize_anti_spoofing.py), run through onnxruntime without torch.
+    def __init__(self, model_path, providers=None):
+        import onnxruntime
+
+        self.session = onnxruntime.InferenceSession(
+            model_path, providers=providers or ["CPUExecutionProvider"]
         )
-        return transform(face_crop).unsqueeze(0).to(self.device)
+        self.input_name = self.session.get_inputs()[0].name
 
-    def predict(self, face_crop):
-        try:
-            input_tensor = self.preprocess(face_crop)
-            with torch.no_grad():
-                output = self.model(input_tensor)
-                prediction = torch.sigmoid(output).squeeze()  # Handle multi-element tensor
-                # Assuming the model outputs a multi-class prediction, take the maximum value
-                prediction = prediction.max().item()
-                return prediction > 0.5  # Adjust threshold as needed
-        except Exception as e:
-            logging.error(f"Error in anti-spoofing prediction: {e}")
-            return False
+    def predict_scores(self, face_crops):
+        if len(face_crops) == 0:
+            return np.empty((0,), dtype=np.float32)
+        output = self.session.run(None, {self.input_name: preprocess_batch(face_crops)})[0]
+        # Take the highest class probability per face
+        return (1.0 / (1.0 + np.exp(-output))).max(axis=1)
+
+
+ANTI_SPOOFING_BACKENDS = {
+    "torch": SilentFaceAntiSpoofing,
+    "onnx": OnnxAntiSpoofing,
+    "onnx-int8": OnnxAntiSpoofing,
+}
+
+
+def load_anti_spoofing_model(backend, model_path):
+    if backend not in ANTI_SPOOFING_BACKENDS:
+        raise ValueError(f"Unknown anti-spoofing backend: {backend}")
+    return ANTI_SPOOFING_BACKENDS[backend](model_path)
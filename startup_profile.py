@@ -0,0 +1,38 @@
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+
+class StartupProfile:
+    # Wall time of each startup component (deferred imports, model loads,
+    # camera) up to the first processed frame. Components can overlap, e.g.
+    # the camera opens while the models load, so they need not sum to the total.
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.start_time = time.perf_counter()
+        self.timings = []
+        self.reported = False
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.timings.append((name, time.perf_counter() - start_time))
+
+    def timed(self, name, fn, *args, **kwargs):
+        with self.stage(name):
+            return fn(*args, **kwargs)
+
+    def report(self, event="first processed frame"):
+        if not self.enabled or self.reported:
+            return
+        self.reported = True
+        logging.info(f"Startup: {event} after {time.perf_counter() - self.start_time:.2f}s")
+        with self.lock:
+            for name, elapsed in self.timings:
+                logging.info(f"Startup {name}: {elapsed:.2f}s")
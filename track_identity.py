@@ -0,0 +1,120 @@
+import time
+import logging
+
+
+class TrackIdentity:
+    __slots__ = ("name", "similarity", "frame_id", "timestamp", "box_area", "student_id")
+
+    def __init__(self, name, similarity, frame_id, timestamp, box_area, student_id=None):
+        self.name = name
+        self.similarity = similarity
+        self.frame_id = frame_id
+        self.timestamp = timestamp
+        self.box_area = box_area
+        self.student_id = student_id
+
+
+class TrackIdentityCache:
+    def __init__(
+        self,
+        recheck_frames=30,
+        recheck_seconds=5.0,
+        confidence_decay=0.99,
+        min_confidence=0.6,
+        area_change_ratio=0.5,
+    ):
+        self.entries = {}
+        self.recheck_frames = recheck_frames
+        self.recheck_seconds = recheck_seconds
+        self.confidence_decay = confidence_decay
+        self.min_confidence = min_confidence
+        self.area_change_ratio = area_change_ratio
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def confidence(self, entry, frame_id):
+        return entry.similarity * self.confidence_decay ** max(0, frame_id - entry.frame_id)
+
+    def lookup(self, track_id, tlwh, frame_id, now=None):
+        # Returns (name, confidence, student_id) while the cached identity can
+        # be trusted, or None when the track has to go through recognition again.
+        entry = self.entries.get(track_id)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        now = time.monotonic() if now is None else now
+        confidence = self.confidence(entry, frame_id)
+        box_area = float(tlwh[2] * tlwh[3])
+        area_change = abs(box_area / entry.box_area - 1.0) if entry.box_area > 0 else 0.0
+        if (
+            confidence < self.min_confidence
+            or area_change > self.area_change_ratio
+            or frame_id - entry.frame_id >= self.recheck_frames
+            or now - entry.timestamp >= self.recheck_seconds
+        ):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return entry.name, confidence, entry.student_id
+
+    def confirm(self, track_id, name, similarity, tlwh, frame_id, now=None, student_id=None):
+        now = time.monotonic() if now is None else now
+        self.entries[track_id] = TrackIdentity(
+            name, float(similarity), frame_id, now, float(tlwh[2] * tlwh[3]), student_id
+        )
+
+    def discard(self, track_id):
+        self.entries.pop(track_id, None)
+
+    def evict(self, active_track_ids):
+        for track_id in [t for t in self.entries if t not in active_track_ids]:
+            logging.info(f"Evicting cached identity for track {track_id}.")
+            del self.entries[track_id]
+
+
+class TrackAttendance:
+    # Emits one attendance event per (track, student): a track counts once
+    # `confirmations` consecutive fresh recognitions of it matched the same
+    # student, and its end is reported so check-outs can follow the track
+    # lifecycle. Callers observe every fresh recognition of a track, with a
+    # student_id of None for Unknown or spoofed faces, and skip frames
+    # answered from TrackIdentityCache.
+    def __init__(self, confirmations=3):
+        self.confirmations = confirmations
+        self.candidates = {}
+        self.confirmed = {}
+
+    def is_confirmed(self, track_id, student_id):
+        confirmed = self.confirmed.get(track_id)
+        return confirmed is not None and confirmed[0] == student_id
+
+    def observe(self, track_id, student_id, name):
+        # True exactly once, when the track reaches the confirmation count; a
+        # recognition of nobody restarts the count.
+        if student_id is None:
+            self.candidates.pop(track_id, None)
+            return False
+        confirmed = self.confirmed.get(track_id)
+        if confirmed is not None and confirmed[0] == student_id:
+            return False
+        candidate = self.candidates.get(track_id)
+        if candidate is None or candidate[0] != student_id:
+            candidate = self.candidates[track_id] = [student_id, name, 0]
+        candidate[2] += 1
+        if candidate[2] < self.confirmations:
+            return False
+        del self.candidates[track_id]
+        self.confirmed[track_id] = (student_id, name)
+        return True
+
+    def end(self, active_track_ids):
+        # Returns (track_id, student_id, name) for confirmed tracks that ended.
+        for track_id in [t for t in self.candidates if t not in active_track_ids]:
+            del self.candidates[track_id]
+        ended = [t for t in self.confirmed if t not in active_track_ids]
+        return [(track_id, *self.confirmed.pop(track_id)) for track_id in ended]